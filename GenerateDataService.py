@@ -1,6 +1,16 @@
+import argparse
 import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
 import numpy as np
 
+from utils import save_data
+
+# Имена, доступные в выражениях функций; x подставляется как массив всех точек сразу
+NAMESPACE = {"np": np, "sin": np.sin, "cos": np.cos, "exp": np.exp, "sqrt": np.sqrt}
+
 def get_functions():
     """Запрашивает у пользователя количество и тип функций."""
     num_funcs = int(input("Сколько функций хотите использовать? "))
@@ -15,25 +25,141 @@ def get_range():
     x_min = float(input("Введите минимальное значение x: "))
     x_max = float(input("Введите максимальное значение x: "))
     num_points = int(input("Сколько точек сгенерировать? "))
-    return np.linspace(x_min, x_max, num_points)
+    return x_min, x_max, num_points
+
+def get_output_file():
+    """Запрашивает у пользователя имя файла; расширение .bin выбирает бинарный формат."""
+    filename = input("Куда сохранить данные (data5.json или data5.bin, по умолчанию data5.json)? ").strip()
+    return filename or "data5.json"
+
+def evaluate_function(func, x_values):
+    """
+    Вычисляет выражение сразу для всего массива x одним векторизованным вызовом.
+
+    Выражение компилируется один раз; результат-константа (например, "2") растягивается на все точки.
+    Выражения, которые работают только с числами (max(x, 0), x if x > 0 else 0), вычисляются
+    поэлементно, как раньше.
+    """
+    code = compile(func, "<function>", "eval")
+    namespace = dict(NAMESPACE, x=x_values)
+    try:
+        y_values = eval(code, namespace)
+        return np.broadcast_to(np.asarray(y_values, dtype=np.float64), x_values.shape)
+    except Exception:
+        pass
+
+    def evaluate_at(x):
+        namespace["x"] = x
+        return float(eval(code, namespace))
+
+    return np.vectorize(evaluate_at, otypes=[np.float64])(x_values)
 
-def generate_data():
-    """Генерирует значения функций в заданном диапазоне."""
-    functions = get_functions()
-    x_values = get_range()
-    data = {"x": x_values.tolist(), "functions": {}}
+def _evaluate_into_shared_memory(task):
+    """Вычисляет одну функцию в процессе пула и пишет результат в свою строку общей памяти."""
+    func, row, x_min, x_max, num_points, shm_name, num_funcs = task
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        results = np.ndarray((num_funcs, num_points), dtype=np.float64, buffer=shm.buf)
+        results[row] = evaluate_function(func, np.linspace(x_min, x_max, num_points))
+        del results
+        return None
+    except Exception as e:
+        return str(e)
+    finally:
+        shm.close()
 
-    for func in functions:
+def generate_data(functions, x_min, x_max, num_points, filename="data5.json", workers=None):
+    """
+    Генерирует значения функций в заданном диапазоне и сохраняет их в файл.
+
+    Независимые функции считаются параллельно в пуле процессов; каждый процесс строит
+    np.linspace сам и пишет результат в общую память, так что большие массивы не пересылаются.
+
+    :param functions: список выражений от x (например, sin(x), cos(x), x**2)
+    :param workers: количество процессов; None - по числу ядер, 1 - без пула
+    :return: словарь с данными (x и functions)
+    :raises ValueError: если какую-то функцию не удалось вычислить; файл тогда не записывается
+    """
+    x_values = np.linspace(x_min, x_max, num_points)
+    data = {"x": x_values, "functions": {}}
+    workers = min(workers or os.cpu_count() or 1, len(functions))
+    failed = []
+
+    if workers <= 1:
+        for func in functions:
+            try:
+                data["functions"][func] = np.array(evaluate_function(func, x_values))
+            except Exception as e:
+                print(f"Ошибка в функции '{func}': {e}")
+                failed.append(func)
+    elif functions:
+        shm = shared_memory.SharedMemory(create=True, size=max(len(functions) * num_points * 8, 1))
         try:
-            y_values = [eval(func, {"x": x, "np": np, "sin": np.sin, "cos": np.cos, "exp": np.exp, "sqrt": np.sqrt}) for x in x_values]
-            data["functions"][func] = list(map(float, y_values))  # Приводим к списку float
-        except Exception as e:
-            print(f"Ошибка в функции '{func}': {e}")
+            tasks = [(func, row, x_min, x_max, num_points, shm.name, len(functions))
+                     for row, func in enumerate(functions)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                errors = list(pool.map(_evaluate_into_shared_memory, tasks))
+            results = np.ndarray((len(functions), num_points), dtype=np.float64, buffer=shm.buf)
+            for row, (func, error) in enumerate(zip(functions, errors)):
+                if error is not None:
+                    print(f"Ошибка в функции '{func}': {error}")
+                    failed.append(func)
+                else:
+                    data["functions"][func] = results[row].copy()
+            del results
+        finally:
+            shm.close()
+            shm.unlink()
+
+    if failed:
+        raise ValueError(f"Не удалось вычислить функции: {', '.join(failed)}; файл {filename} не записан")
+    save_data(data, filename)
+
+    print(f"Данные успешно сохранены в {filename}")
+    return data
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Генерирует значения функций для 3D-гистограммы.")
+    parser.add_argument("-f", "--function", dest="functions", action="append",
+                        help="выражение от x, например sin(x); можно указать несколько раз")
+    parser.add_argument("--x-min", type=float, help="минимальное значение x")
+    parser.add_argument("--x-max", type=float, help="максимальное значение x")
+    parser.add_argument("-n", "--num-points", type=int, help="сколько точек сгенерировать")
+    parser.add_argument("-o", "--output", help="файл результата: .json или .bin (по умолчанию data5.json)")
+    parser.add_argument("-j", "--workers", type=int, help="количество процессов (по умолчанию по числу ядер)")
+    parser.add_argument("-c", "--config", help="JSON-файл с теми же параметрами: functions, x_min, x_max, "
+                                               "num_points, output, workers")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """
+    Берёт параметры из командной строки и/или конфигурации; аргументы командной строки
+    важнее конфигурации. Если функции нигде не заданы, параметры запрашиваются интерактивно.
+    """
+    args = parse_args(argv)
+    config = {}
+    if args.config:
+        with open(args.config, "r") as f:
+            config = json.load(f)
+    params = dict(config)
+    for key in ("functions", "x_min", "x_max", "num_points", "output", "workers"):
+        value = getattr(args, key)
+        if value is not None:
+            params[key] = value
 
-    with open("data5.json", "w") as f:
-        json.dump(data, f, indent=4)
+    if not params.get("functions"):
+        params["functions"] = get_functions()
+        params["x_min"], params["x_max"], params["num_points"] = get_range()
+        params["output"] = get_output_file()
+    missing = [key for key in ("x_min", "x_max", "num_points") if params.get(key) is None]
+    if missing:
+        raise SystemExit(f"Не заданы параметры: {', '.join(missing)}")
 
-    print("Данные успешно сохранены в data.json")
+    try:
+        generate_data(params["functions"], params["x_min"], params["x_max"], params["num_points"],
+                      params.get("output") or "data5.json", params.get("workers"))
+    except ValueError as e:
+        raise SystemExit(str(e))
 
 if __name__ == "__main__":
-    generate_data()
+    main()
@@ -0,0 +1,64 @@
+import numpy as np
+
+
+class BarStore:
+    """
+    Колоночное хранилище баров гистограммы вместо списка объектов Bar.
+
+    Бары упорядочены по x, как их строит generate_bars_from_data, поэтому видимый
+    участок находится двоичным поиском (index_range).
+
+    Положения и размеры баров лежат в непрерывных массивах длины N, высоты сегментов -
+    в матрице N x K (бары x функции), цвета хранятся один раз на функцию. Основания
+    сегментов при накоплении считаются сразу для всех баров: положительные значения
+    складываются вверх от нуля, отрицательные - вниз, каждая группа в порядке функций.
+    """
+
+    def __init__(self, x, y, width, depth, heights, colors, function_names=None):
+        """
+        x, y - положения оснований баров (массивы длины N или скаляры)
+        width, depth - размеры оснований (массивы длины N или скаляры)
+        heights - матрица N x K высот сегментов (значения функций с учётом масштаба)
+        colors - список из K цветов, по одному на функцию
+        """
+        self.heights = np.asarray(heights, dtype=np.float64)
+        num_bars = self.heights.shape[0]
+        self.x = np.ascontiguousarray(np.broadcast_to(np.asarray(x, dtype=np.float64), num_bars))
+        self.y = np.ascontiguousarray(np.broadcast_to(np.asarray(y, dtype=np.float64), num_bars))
+        self.width = np.ascontiguousarray(np.broadcast_to(np.asarray(width, dtype=np.float64), num_bars))
+        self.depth = np.ascontiguousarray(np.broadcast_to(np.asarray(depth, dtype=np.float64), num_bars))
+        self.colors = list(colors)
+        self.function_names = list(function_names) if function_names is not None else []
+
+        # Нижние границы сегментов: накопленные суммы положительной и отрицательной частей
+        positive = np.maximum(self.heights, 0)
+        negative = np.minimum(self.heights, 0)
+        self.bottoms = np.where(self.heights >= 0,
+                                np.cumsum(positive, axis=1) - positive,
+                                np.cumsum(negative, axis=1))
+        # Индекс для двоичного поиска: наибольший правый край среди баров до данного включительно
+        self.right_edges = np.maximum.accumulate(self.x + self.width) if num_bars else np.empty(0)
+
+    def __len__(self):
+        return len(self.x)
+
+    def slice(self, start=0, stop=None):
+        """BarStore из баров с номерами [start, stop)."""
+        return BarStore(self.x[start:stop], self.y[start:stop], self.width[start:stop], self.depth[start:stop],
+                        self.heights[start:stop], self.colors, self.function_names)
+
+    def centers(self, start=0, stop=None):
+        """Координаты X середин баров с номерами [start, stop)."""
+        return self.x[start:stop] + self.width[start:stop] / 2
+
+    def index_range(self, x_min, x_max):
+        """
+        Номера баров, пересекающих отрезок [x_min, x_max], двоичным поиском по x.
+
+        :return: (start, stop) - бары с номерами [start, stop)
+        """
+        if x_min > x_max:
+            return 0, 0
+        start = int(np.searchsorted(self.right_edges, x_min, side="left"))
+        stop = int(np.searchsorted(self.x, x_max, side="right"))
+        return start, max(start, stop)
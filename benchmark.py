@@ -0,0 +1,202 @@
+"""
+Нагрузочные замеры под платформой Qt offscreen.
+
+Для синтетических наборов данных разного размера замеряются load_data (JSON и .bin),
+generate_bars_from_data, функции диапазонов и коэффициента из utils и paintEvent
+GraphWidget с отрисовкой в QImage при фиксированном облёте камеры. Результаты пишутся
+в JSON-отчёт и сравниваются с сохранённым базовым отчётом.
+
+Пример: python benchmark.py --sizes 1000 100000 --functions 1 4 --baseline bench_baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PySide6.QtGui import QImage
+from PySide6.QtWidgets import QApplication
+
+import main as visualizer
+from utils import load_data, save_data, get_x_range, get_function_range, calculate_koef
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+DEFAULT_FUNCTIONS = [1, 2, 4, 8]
+# Облёт камеры для замера отрисовки: (азимут, возвышение, масштаб)
+CAMERA_SWEEP = [(azimuth, elevation, scale)
+                for scale in (1.0, 0.05)
+                for elevation in (30, 60)
+                for azimuth in range(0, 360, 45)]
+IMAGE_SIZE = (800, 600)
+
+
+def make_dataset(num_points, num_functions, seed=0):
+    """Синтетический набор данных: смесь синусоид, шума и тренда."""
+    rng = np.random.default_rng(seed)
+    x_values = np.linspace(-10, 10, num_points)
+    functions = {}
+    for j in range(num_functions):
+        values = np.sin(x_values * (j + 1)) * (j + 1) + rng.normal(0, 0.1, num_points) + x_values / (j + 5)
+        functions[f"f{j + 1}(x)"] = values
+    return {"x": x_values, "functions": functions}
+
+
+def measure(func, repeats):
+    """Выполняет func repeats раз и возвращает времена в секундах."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings):
+    return {"median": statistics.median(timings), "min": min(timings), "repeats": len(timings)}
+
+
+def bench_dataset(num_points, num_functions, repeats, workdir, formats):
+    """Замеряет все этапы для одного набора данных; возвращает словарь {имя замера: сводка}."""
+    results = {}
+    tag = f"n={num_points}/f={num_functions}"
+    data = make_dataset(num_points, num_functions)
+
+    for extension in formats:
+        path = os.path.join(workdir, f"bench_load_{num_points}_{num_functions}{extension}")
+        save_data(data, path)
+        # Для .bin в замер входит и чтение всех значений, иначе memmap ничего не читает с диска
+        if extension == ".bin":
+            results[f"load_data{extension}/{tag}"] = summarize(measure(
+                lambda: [np.asarray(column).sum() for column in load_data(path)["functions"].values()], repeats))
+        else:
+            results[f"load_data{extension}/{tag}"] = summarize(measure(lambda: load_data(path), repeats))
+        os.remove(path)
+
+    results[f"get_x_range/{tag}"] = summarize(measure(lambda: get_x_range(data["x"]), repeats))
+    results[f"get_function_range/{tag}"] = summarize(measure(lambda: get_function_range(data["functions"]), repeats))
+    results[f"calculate_koef/{tag}"] = summarize(measure(lambda: calculate_koef(data, 50), repeats))
+
+    koef = calculate_koef(data, 50)
+    results[f"generate_bars_from_data/{tag}"] = summarize(measure(
+        lambda: visualizer.generate_bars_from_data(data, scale=koef, bar_spacing=2), repeats))
+
+    path = os.path.join(workdir, f"bench_paint_{num_points}_{num_functions}.bin")
+    save_data(data, path)
+    results[f"paintEvent/{tag}"] = summarize(bench_paint(path, repeats))
+    os.remove(path)
+    return results
+
+
+def bench_paint(path, repeats):
+    """
+    Время одного кадра paintEvent в QImage для облёта камеры CAMERA_SWEEP.
+
+    Каждый повтор готовит набор данных и GraphWidget так же, как приложение
+    (prepare_dataset и create_graph_widget), поэтому в замер кадров входят построение
+    недостающих уровней детализации, проекция и отрисовка; возвращается среднее время кадра.
+    """
+    timings = []
+    for _ in range(repeats):
+        widget = visualizer.create_graph_widget(visualizer.prepare_dataset(path), background_rendering=False)
+        widget.resize(*IMAGE_SIZE)
+        image = QImage(*IMAGE_SIZE, QImage.Format_ARGB32_Premultiplied)
+        start = time.perf_counter()
+        for azimuth, elevation, scale in CAMERA_SWEEP:
+            widget.azimuth, widget.elevation, widget.scale_factor = azimuth, elevation, scale
+            image.fill(0xffffffff)
+            widget.render(image)
+        timings.append((time.perf_counter() - start) / len(CAMERA_SWEEP))
+        widget.deleteLater()
+    return timings
+
+
+def compare(report, baseline, tolerance, min_delta=0.0):
+    """
+    Сравнивает лучшие времена (min по повторам) с базовым отчётом.
+
+    Минимум меньше медианы зависит от случайных задержек системы, а порог min_delta
+    (в секундах) не даёт считать регрессией шум на замерах в доли миллисекунды.
+
+    :return: список строк о замерах, ставших медленнее и более чем на tolerance (доля), и более чем на min_delta
+    """
+    regressions = []
+    for name, result in report["results"].items():
+        reference = baseline.get("results", {}).get(name)
+        if reference is None:
+            continue
+        current, previous = result["min"], reference["min"]
+        if current > previous * (1 + tolerance) and current - previous > min_delta:
+            regressions.append(f"{name}: {previous * 1000:.2f} мс -> {current * 1000:.2f} мс "
+                               f"(+{(current / previous - 1) * 100:.0f}%)")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры производительности PyGraphVisualizer (Qt offscreen).")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="количество точек")
+    parser.add_argument("--functions", type=int, nargs="+", default=DEFAULT_FUNCTIONS, help="количество функций")
+    parser.add_argument("--repeats", type=int, default=5, help="повторов каждого замера")
+    parser.add_argument("--formats", nargs="+", default=[".json", ".bin"], help="форматы файлов для load_data")
+    parser.add_argument("-o", "--output", default="bench_report.json", help="куда записать отчёт")
+    parser.add_argument("--baseline", help="базовый отчёт для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="допустимое замедление относительно базового отчёта (доля, по умолчанию 0.25)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5,
+                        help="замедление меньше этого (в мс) не считается регрессией, по умолчанию 0.5")
+    parser.add_argument("--save-baseline", action="store_true", help="записать отчёт как новый базовый")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "qt_platform": app.platformName(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "camera_sweep": CAMERA_SWEEP,
+            "image_size": IMAGE_SIZE,
+        },
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for num_points in args.sizes:
+            for num_functions in args.functions:
+                results = bench_dataset(num_points, num_functions, args.repeats, workdir, args.formats)
+                for name, result in results.items():
+                    print(f"{name:55s} min {result['min'] * 1000:10.2f} мс, медиана {result['median'] * 1000:10.2f} мс")
+                report["results"].update(results)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Отчёт записан в {args.output}")
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"Базовый отчёт обновлён: {args.baseline}")
+        return 0
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.min_delta_ms / 1000)
+        if regressions:
+            print("Замедление относительно базового отчёта:")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print("Регрессий относительно базового отчёта нет")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Пакетный экспорт графиков в изображения без окна (Qt offscreen).
+
+Каждый файл данных рисуется для каждого пресета камеры тем же кодом GraphWidget, что и
+в интерактивном окне. Работа распределяется по пулу процессов; процесс загружает набор
+данных и строит бары один раз и использует их для всех ракурсов этого файла.
+
+Пример: python export.py data5.json data6.bin -p 45,30,1 -p 135,60,0.5,1920x1080 -o snapshots
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+# Пресет камеры: углы в градусах, масштаб и размер изображения в пикселях; name - суффикс имени файла
+CameraPreset = namedtuple("CameraPreset", "azimuth elevation scale width height name")
+
+DEFAULT_SIZE = (800, 600)
+DEFAULT_PRESETS = ["45,30,1", "135,30,1", "225,30,1", "45,60,0.5"]
+
+# Последний набор данных, подготовленный в этом процессе: (файл, GraphWidget); более старые освобождаются
+_graph = (None, None)
+_app = None
+
+
+def make_preset(azimuth, elevation, scale=1.0, width=DEFAULT_SIZE[0], height=DEFAULT_SIZE[1], name=None):
+    if name is None:
+        name = f"az{azimuth:g}_el{elevation:g}_s{scale:g}_{width}x{height}"
+    return CameraPreset(float(azimuth), float(elevation), float(scale), int(width), int(height), name)
+
+
+def parse_preset(text):
+    """
+    Разбирает пресет из строки "азимут,возвышение[,масштаб[,ШИРИНАxВЫСОТА]]".
+
+    :raises ValueError: если строку нельзя разобрать
+    """
+    fields = text.split(",")
+    if not 2 <= len(fields) <= 4:
+        raise ValueError(f"Неверный пресет камеры: {text}")
+    width, height = DEFAULT_SIZE
+    if len(fields) == 4:
+        width, height = (int(value) for value in fields[3].lower().split("x"))
+    return make_preset(float(fields[0]), float(fields[1]), float(fields[2]) if len(fields) > 2 else 1.0,
+                       width, height)
+
+
+def _init_worker():
+    """Создаёт QApplication в процессе пула; без него QPainter не может рисовать текст."""
+    global _app
+    from PySide6.QtWidgets import QApplication
+    _app = QApplication.instance() or QApplication([])
+
+
+def _graph_for(data_file):
+    """
+    GraphWidget набора данных; подряд идущие задачи одного файла используют его повторно.
+
+    Процесс хранит только последний набор: виджет предыдущего файла вместе с данными и
+    уровнями детализации удаляется сразу, так как цикла событий для deleteLater() нет.
+    """
+    global _graph
+    cached_file, graph = _graph
+    if cached_file == data_file:
+        return graph
+    _graph = (None, None)
+    if graph is not None:
+        import shiboken6
+        shiboken6.delete(graph)
+        del graph
+    from main import create_graph_widget, prepare_dataset
+    graph = create_graph_widget(prepare_dataset(data_file), background_rendering=False)
+    _graph = (data_file, graph)
+    return graph
+
+
+def _export_task(task):
+    """
+    Рисует один файл данных для списка пресетов в процессе пула.
+
+    :return: (список (путь к изображению, секунды), текст ошибки или None)
+    """
+    data_file, presets, output_dir, image_format, background = task
+    from PySide6.QtGui import QColor
+    from geometry import Camera
+
+    written = []
+    try:
+        graph = _graph_for(data_file)
+        stem = os.path.splitext(os.path.basename(data_file))[0]
+        for preset in presets:
+            start = time.perf_counter()
+            camera = Camera(preset.azimuth, preset.elevation, preset.scale, 0, 0, preset.width, preset.height)
+            image = graph.render_image(camera, background=QColor(background))
+            path = os.path.join(output_dir, f"{stem}_{preset.name}.{image_format}")
+            if not image.save(path):
+                raise OSError(f"не удалось записать {path}")
+            written.append((path, time.perf_counter() - start))
+        return written, None
+    except Exception as e:
+        return written, f"{data_file}: {e}"
+
+
+def export_images(data_files, presets, output_dir=".", image_format="png", background="white", workers=None):
+    """
+    Рисует каждый файл данных для каждого пресета камеры и сохраняет изображения в output_dir.
+
+    Ракурсы одного файла делятся на части так, чтобы задач хватило на все процессы пула;
+    процесс, которому несколько частей одного файла достались подряд, загружает его один раз.
+
+    :param presets: список CameraPreset
+    :param workers: количество процессов; None - по числу ядер, 1 - в текущем процессе
+    :return: (список (путь к изображению, секунды), список ошибок)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(data_files) * len(presets)))
+    chunks_per_file = max(1, math.ceil(workers / max(len(data_files), 1)))
+    chunk_size = max(1, math.ceil(len(presets) / chunks_per_file))
+    tasks = [(data_file, presets[start:start + chunk_size], output_dir, image_format, background)
+             for data_file in data_files
+             for start in range(0, len(presets), chunk_size)]
+
+    if workers <= 1:
+        _init_worker()
+        results = [_export_task(task) for task in tasks]
+    else:
+        # spawn: процессы пула не наследуют состояние Qt родителя
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker) as pool:
+            results = list(pool.map(_export_task, tasks))
+
+    written = [item for items, _ in results for item in items]
+    errors = [error for _, error in results if error is not None]
+    return written, errors
+
+
+def load_presets(filename):
+    """Читает пресеты из JSON: список объектов с полями azimuth, elevation, scale, width, height, name."""
+    with open(filename, "r") as f:
+        return [make_preset(**preset) for preset in json.load(f)]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный экспорт 3D-гистограмм в изображения (Qt offscreen).")
+    parser.add_argument("data_files", nargs="+", help="файлы данных (.json или .bin)")
+    parser.add_argument("-p", "--preset", dest="presets", action="append",
+                        help="пресет камеры: азимут,возвышение[,масштаб[,ШИРИНАxВЫСОТА]]; можно указать несколько раз")
+    parser.add_argument("-c", "--presets-file", help="JSON-файл со списком пресетов: azimuth, elevation, scale, "
+                                                     "width, height, name")
+    parser.add_argument("-o", "--output-dir", default="export", help="каталог для изображений")
+    parser.add_argument("-f", "--format", default="png", help="формат изображений: png, jpg, bmp...")
+    parser.add_argument("--background", default="white", help="цвет фона (имя или #rrggbb; transparent - без фона)")
+    parser.add_argument("-j", "--workers", type=int, help="количество процессов (по умолчанию по числу ядер)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    presets = load_presets(args.presets_file) if args.presets_file else []
+    presets += [parse_preset(text) for text in args.presets or []]
+    if not presets:
+        presets = [parse_preset(text) for text in DEFAULT_PRESETS]
+
+    start = time.perf_counter()
+    written, errors = export_images(args.data_files, presets, args.output_dir, args.format, args.background,
+                                    args.workers)
+    for error in errors:
+        print(f"Ошибка: {error}")
+    print(f"Сохранено изображений: {len(written)} в {args.output_dir} за {time.perf_counter() - start:.1f} с")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+import math
+from collections import namedtuple
+
+import numpy as np
+
+# Смещения восьми вершин кубоида (A..H) в долях ширины, глубины и высоты
+CUBOID_CORNERS = np.array([
+    [0, 0, 0],  # A
+    [1, 0, 0],  # B
+    [1, 1, 0],  # C
+    [0, 1, 0],  # D
+    [0, 0, 1],  # E
+    [1, 0, 1],  # F
+    [1, 1, 1],  # G
+    [0, 1, 1],  # H
+], dtype=np.float64)
+
+# Грани кубоида в виде индексов вершин
+CUBOID_FACES = np.array([
+    [4, 5, 6, 7],  # Верхняя грань (EFGH)
+    [0, 1, 2, 3],  # Нижняя грань (ABCD)
+    [1, 2, 6, 5],  # Правая грань (BCGF)
+    [0, 3, 7, 4],  # Левая грань (ADHE)
+    [0, 1, 5, 4],  # Передняя грань (ABFE)
+    [3, 2, 6, 7],  # Задняя грань (DCGH)
+])
+
+
+class Camera(namedtuple("Camera", "azimuth elevation scale_factor x_offset y_offset width height")):
+    """Неизменяемый снимок состояния камеры GraphWidget, по которому можно рисовать в любом потоке."""
+    __slots__ = ()
+
+    def projection_key(self):
+        """Часть состояния, от которой зависит проекция граней (смещение сюда не входит)."""
+        return self.azimuth, self.elevation, self.scale_factor, self.width, self.height
+
+
+def build_cuboids(bars):
+    """
+    Раскладывает сегменты всех баров в плоские массивы кубоидов.
+
+    Основания берутся из накопленных сумм BarStore: положительные сегменты растут вверх
+    от нуля, отрицательные - вниз. Высота отрицательного сегмента переводится в
+    положительную, чтобы грани кубоида не выворачивались; сегменты нулевой высоты пропускаются.
+
+    :param bars: BarStore
+    :return: (origins, sizes, function_indices, bar_indices) - массивы (N, 3) углов и размеров,
+             номера функций и номера баров длины N
+    """
+    bar_indices, function_indices = np.nonzero(bars.heights)
+    origins = np.column_stack((bars.x[bar_indices], bars.y[bar_indices],
+                               bars.bottoms[bar_indices, function_indices]))
+    sizes = np.column_stack((bars.width[bar_indices], bars.depth[bar_indices],
+                             np.abs(bars.heights[bar_indices, function_indices])))
+    return origins, sizes, function_indices, bar_indices
+
+
+def cuboid_vertices(origins, sizes):
+    """Возвращает массив (N, 8, 3) вершин кубоидов в мировых координатах."""
+    return origins[:, None, :] + CUBOID_CORNERS[None, :, :] * sizes[:, None, :]
+
+
+def rotation_matrix(azimuth, elevation):
+    """
+    Матрица поворота камеры (в градусах), та же, что в GraphWidget.project_point.
+
+    Первые две строки дают экранные X и Y, третья - глубину вдоль направления взгляда.
+    """
+    rad_az = math.radians(azimuth)
+    rad_el = math.radians(elevation)
+    cos_az, sin_az = math.cos(rad_az), math.sin(rad_az)
+    cos_el, sin_el = math.cos(rad_el), math.sin(rad_el)
+    return np.array([
+        [cos_az, -sin_az, 0.0],
+        [sin_az * cos_el, cos_az * cos_el, -sin_el],
+        [sin_az * sin_el, cos_az * sin_el, cos_el],
+    ])
+
+
+def project_vertices(vertices, azimuth, elevation, scale, offset_x, offset_y):
+    """
+    Проецирует массив точек (..., 3) на экран одним матричным умножением.
+
+    :return: массив (..., 2) экранных координат
+    """
+    matrix = rotation_matrix(azimuth, elevation)[:2] * scale
+    screen = vertices @ matrix.T
+    screen += (offset_x, offset_y)
+    return screen
+
+
+def visible_x_range(camera, y_range, z_range, margin=0):
+    """
+    Диапазон мировых X, точки которого могут попасть на экран камеры.
+
+    Обратное преобразование камеры: экранные X и Y линейно зависят от мировых x, y, z,
+    поэтому для каждой экранной оси условие "точка внутри окна (с запасом margin пикселей)
+    при каких-то y из y_range и z из z_range" задаёт отрезок по x. Результат - пересечение
+    отрезков обеих осей; он может быть шире точной видимой области, но не уже.
+
+    :param camera: Camera (смещение камеры учитывается)
+    :param y_range: (y_min, y_max) - границы сцены по глубине
+    :param z_range: (z_min, z_max) - границы сцены по высоте
+    :return: (x_min, x_max); при x_min > x_max на экран не попадает ничего
+    """
+    matrix = rotation_matrix(camera.azimuth, camera.elevation)[:2] * camera.scale_factor
+    centers = (camera.width / 2 + camera.x_offset, camera.height / 2 + camera.y_offset)
+    x_min, x_max = -math.inf, math.inf
+    for row, center, size in zip(matrix, centers, (camera.width, camera.height)):
+        # Вклад y и z в экранную координату по углам прямоугольника y_range x z_range
+        rest = [row[1] * y + row[2] * z + center for y in y_range for z in z_range]
+        low, high = -margin - max(rest), size + margin - min(rest)
+        if abs(row[0]) < 1e-12:
+            # Ось X сцены не сдвигает точки по этой экранной оси: видно всё или ничего
+            if low > 0 or high < 0:
+                return math.inf, -math.inf
+            continue
+        bounds = sorted((low / row[0], high / row[0]))
+        x_min, x_max = max(x_min, bounds[0]), min(x_max, bounds[1])
+    return x_min, x_max
+
+
+# Внешние нормали граней в порядке CUBOID_FACES
+FACE_NORMALS = np.array([
+    [0, 0, 1],
+    [0, 0, -1],
+    [1, 0, 0],
+    [-1, 0, 0],
+    [0, -1, 0],
+    [0, 1, 0],
+], dtype=np.float64)
+
+
+def view_direction(azimuth, elevation):
+    """Единичный вектор из сцены в сторону камеры (третья строка rotation_matrix)."""
+    return rotation_matrix(azimuth, elevation)[2]
+
+
+def visible_faces(azimuth, elevation):
+    """Индексы граней CUBOID_FACES, обращённых к камере; у кубоида их не больше трёх."""
+    return np.flatnonzero(FACE_NORMALS @ view_direction(azimuth, elevation) > 1e-9)
+
+
+def depth_order(origins, sizes, azimuth, elevation):
+    """
+    Порядок отрисовки кубоидов от дальних к ближним для всей сцены.
+
+    Столбцы стоят в ряд вдоль X и имеют одинаковую глубину, а сегменты внутри столбца
+    сложены вдоль Z. Поэтому любые два кубоида разделяются плоскостью, перпендикулярной
+    X (разные столбцы) или Z (один столбец), и достаточно отсортировать центры по
+    проекции на направление к камере: сначала по X, затем по Z.
+    """
+    toward_camera = view_direction(azimuth, elevation)
+    centers = origins + sizes / 2
+    return np.lexsort((centers[:, 2] * toward_camera[2], centers[:, 0] * toward_camera[0]))
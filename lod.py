@@ -0,0 +1,97 @@
+import math
+
+import numpy as np
+
+# Минимальная ширина агрегированного бара на экране (в пикселях)
+MIN_BAR_PIXELS = 4
+
+
+def aggregate_data(data, bin_size):
+    """
+    Объединяет каждые bin_size соседних значений x в один агрегированный отсчёт.
+
+    :param data: словарь с данными (x и functions)
+    :param bin_size: количество исходных отсчётов в одном бине
+    :return: словарь того же вида, где x и functions - средние по бинам,
+             а min и max - минимумы и максимумы каждой функции по бинам
+    """
+    x_values = np.asarray(data["x"], dtype=np.float64)
+    starts = np.arange(0, len(x_values), bin_size)
+    counts = np.diff(np.append(starts, len(x_values)))
+    aggregated = {
+        "x": np.add.reduceat(x_values, starts) / counts,
+        "functions": {},
+        "min": {},
+        "max": {},
+        "bin_size": bin_size,
+    }
+    for func_name, values in data["functions"].items():
+        values = np.asarray(values, dtype=np.float64)
+        aggregated["functions"][func_name] = np.add.reduceat(values, starts) / counts
+        aggregated["min"][func_name] = np.minimum.reduceat(values, starts)
+        aggregated["max"][func_name] = np.maximum.reduceat(values, starts)
+    return aggregated
+
+
+class LevelOfDetail:
+    """
+    Уровни детализации данных между исходным набором и GraphWidget.
+
+    Размер бина - степень двойки, поэтому при масштабировании уровни переиспользуются,
+    а не пересчитываются на каждый шаг колесика.
+    """
+
+    def __init__(self, data, make_bars, bar_pitch, max_bars=20000):
+        """
+        :param data: словарь с данными (x и functions)
+        :param make_bars: функция (aggregated_data, bin_size) -> BarStore
+        :param bar_pitch: шаг одного исходного бара по X (ширина плюс промежуток)
+        :param max_bars: верхняя граница количества баров, видимых в окне
+        """
+        self.data = data
+        self.make_bars = make_bars
+        self.bar_pitch = bar_pitch
+        self.max_bars = max_bars
+        self._levels = {}
+
+    def bin_size_for(self, scale_factor, widget_width, visible_samples=None):
+        """
+        Подбирает размер бина так, чтобы бар занимал на экране не меньше MIN_BAR_PIXELS.
+
+        visible_samples - сколько исходных отсчётов видно в окне (см. overview_bin_size);
+        бин укрупняется, только если видимых баров получилось бы больше max_bars. Без него
+        ограничение считается по всему набору данных.
+        """
+        if visible_samples is None:
+            visible_samples = len(self.data["x"])
+        # Сколько исходных отсчётов помещается по ширине виджета и сколько баров мы готовы там нарисовать
+        samples_across = widget_width / (self.bar_pitch * scale_factor)
+        bins_across = widget_width / MIN_BAR_PIXELS
+        bin_size = 2 ** max(0, math.floor(math.log2(max(samples_across / bins_across, 1))))
+        # Ограничиваем количество видимых баров независимо от масштаба
+        min_bin_size = 2 ** max(0, math.ceil(math.log2(max(visible_samples / self.max_bars, 1))))
+        return min(max(bin_size, min_bin_size), self.max_bin_size())
+
+    def overview_bin_size(self):
+        """
+        Уровень, на котором во всём наборе не больше max_bars баров.
+
+        Он дёшев в построении, и по нему оценивается, сколько исходных отсчётов видно в окне.
+        """
+        num_points = len(self.data["x"])
+        return min(2 ** max(0, math.ceil(math.log2(max(num_points / self.max_bars, 1)))), self.max_bin_size())
+
+    def max_bin_size(self):
+        """Самый грубый уровень: наибольшая степень двойки, не превышающая количество отсчётов."""
+        return 2 ** max(0, math.floor(math.log2(max(len(self.data["x"]), 1))))
+
+    def coarser(self, bin_size, factor):
+        """Размер бина в factor раз грубее заданного (factor - степень двойки)."""
+        return min(bin_size * factor, self.max_bin_size())
+
+    def level(self, bin_size):
+        """Возвращает (bars, data) для заданного размера бина; уровни кэшируются."""
+        if bin_size not in self._levels:
+            level_data = self.data if bin_size == 1 else aggregate_data(self.data, bin_size)
+            self._levels[bin_size] = (self.make_bars(level_data, bin_size), level_data)
+        return self._levels[bin_size]
@@ -2,39 +2,206 @@ import logging
 import sys
 import math
 import json
-from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QTabWidget
-from PySide6.QtGui import QPainter, QBrush, QColor, QPolygonF, QPen, QFont
-from PySide6.QtCore import Qt, QPointF
-from utils import get_x_range, get_function_range,calculate_koef,load_data
+import argparse
+from collections import deque
+import numpy as np
+from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QTabWidget, QLabel, QVBoxLayout
+from PySide6.QtGui import QPainter, QPainterPath, QBrush, QColor, QPolygonF, QPen, QFont, QImage
+from PySide6.QtCore import Qt, QPointF, QThreadPool, QTimer, Signal
+from utils import load_data
+from stats import compute_stats
+from lod import LevelOfDetail
+from barstore import BarStore
+from geometry import (CUBOID_FACES, FACE_NORMALS, Camera, build_cuboids, cuboid_vertices, depth_order, project_vertices,
+                      rotation_matrix, view_direction, visible_faces, visible_x_range)
+from streaming import RingBuffer, StreamStats, open_stream_source
+from profiling import FrameRateMeter, FrameStats
 
-data = load_data("data5.json")
-#Это коэффициент от которого зависит масштаб
-koef = calculate_koef(data, 50)
-print("LOGGING коэф масшатбирования: ", koef)
+# Цвета функций по порядку; при большем количестве функций цвета повторяются
+FUNCTION_COLORS = [QColor(200, 0, 0), QColor(0, 0, 200), QColor(0, 200, 0)]
 
+# Кисти граней по цвету функции (QColor.rgba()), см. shaded_brushes
+_SHADED_BRUSHES = {}
 
-# Класс для представления отдельного столбца (бара) гистограммы
-class Bar:
-    def __init__(self, x, y, width, depth, segments):
+
+def shaded_brushes(color):
+    """
+    Кисти шести граней кубоида цвета color в порядке CUBOID_FACES.
+
+    Оттенки считаются один раз на цвет, дальше кисти берутся из кэша.
+    """
+    brushes = _SHADED_BRUSHES.get(color.rgba())
+    if brushes is None:
+        brushes = _SHADED_BRUSHES[color.rgba()] = [
+            QBrush(color.lighter(120)),  # Верхняя грань
+            QBrush(color.darker(180)),  # Нижняя грань
+            QBrush(color.darker(120)),  # Правая грань
+            QBrush(color),  # Левая грань
+            QBrush(color.darker(150)),  # Передняя грань
+            QBrush(color.darker(100))  # Задняя грань
+        ]
+    return brushes
+
+
+# Набор баров одного уровня детализации вместе с их геометрией и кэшем спроецированных граней
+class BarScene:
+    def __init__(self, bars, x_values):
+        self.bars = bars
+        self.x_values = x_values
+        self.brushes = [shaded_brushes(color) for color in bars.colors]
+        # Границы сцены по глубине и высоте для отсечения по окну; сами кубоиды строятся
+        # только для видимых баров (см. build_faces), поэтому подробные уровни не занимают лишней памяти
+        if len(bars):
+            self.y_range = (bars.y.min(), (bars.y + bars.depth).max())
+            self.z_range = (min(np.minimum(bars.heights, 0).sum(axis=1).min(initial=0), 0.0),
+                            max(np.maximum(bars.heights, 0).sum(axis=1).max(initial=0), 0.0))
+        else:
+            self.y_range = self.z_range = (0.0, 0.0)
+        # Кэш спроецированных граней: (ключ проекции, первый бар, конец диапазона баров, грани - см. build_faces)
+        # без учёта смещения камеры. Хранится одним кортежем, чтобы его можно было читать и заменять из разных потоков
+        self._face_cache = (None, 0, 0, None)
+        self._x_labels = {}  # Номер бара -> готовая подпись оси X
+
+    def x_label(self, index):
+        """Подпись оси X для бара; строка форматируется один раз и дальше берётся из кэша."""
+        label = self._x_labels.get(index)
+        if label is None:
+            label = self._x_labels[index] = f"{self.x_values[index]:.1f}"
+        return label
+
+    def visible_range(self, camera):
+        """Номера баров [start, stop), которые могут попасть в окно камеры."""
+        return self.bars.index_range(*visible_x_range(camera, self.y_range, self.z_range))
+
+    def faces(self, camera):
+        """
+        Возвращает грани баров, видимых камерой.
+
+        Кэш перестраивается при изменении camera.projection_key() или когда видимые бары
+        выходят за закэшированный диапазон. Диапазон берётся с запасом в половину видимой
+        части с каждой стороны, чтобы перемещение камеры не перестраивало грани на каждом кадре.
+        """
+        key = camera.projection_key()
+        start, stop = self.visible_range(camera)
+        cached_key, cached_start, cached_stop, faces = self._face_cache
+        if cached_key != key or start < cached_start or stop > cached_stop:
+            margin = (stop - start) // 2
+            start, stop = max(start - margin, 0), min(stop + margin, len(self.bars))
+            faces = self.build_faces(camera, start, stop)
+            self._face_cache = (key, start, stop, faces)
+        return faces
+
+    def build_faces(self, camera, start=0, stop=None):
+        """
+        Проецирует вершины сегментов баров [start, stop) за одно матричное умножение и собирает грани для отрисовки.
+
+        Задние грани отбрасываются по направлению взгляда. Из граней, обращённых к камере вдоль Y,
+        состоит передняя плоскость всей сцены: их ничто не закрывает, поэтому они рисуются
+        последними, одним QPainterPath на кисть. Остальные грани идут от дальних кубоидов к
+        ближним; горизонтальная грань рисуется только у крайнего сегмента столбца, у остальных
+        её закрывает соседний сегмент.
+
+        :return: (faces, batches) - список (QPolygonF, QBrush) в порядке отрисовки и список
+                 (QPainterPath, QBrush, количество граней в пути)
+        """
+        origins, sizes, function_indices, bar_indices = build_cuboids(self.bars.slice(start, stop))
+        if not len(origins):
+            return [], []
+        screen = project_vertices(cuboid_vertices(origins, sizes), camera.azimuth, camera.elevation,
+                                  camera.scale_factor, camera.width / 2, camera.height / 2)
+
+        order = depth_order(origins, sizes, camera.azimuth, camera.elevation)
+        face_indices = visible_faces(camera.azimuth, camera.elevation)
+        # (N, число видимых граней, 4, 2) - координаты вершин видимых граней в порядке отрисовки
+        quads = screen[order[:, None, None], CUBOID_FACES[face_indices][None, :, :]]
+        function_indices = function_indices[order]
+
+        # Какие грани кубоидов рисуются по порядку: грани вдоль X всегда, вдоль Z - только у крайнего сегмента
+        ordered = np.ones((len(order), len(face_indices)), dtype=bool)
+        for column, face_index in enumerate(face_indices.tolist()):
+            normal_axis = np.flatnonzero(FACE_NORMALS[face_index])[0]
+            if normal_axis == 1:
+                ordered[:, column] = False
+            elif normal_axis == 2:
+                ordered[:, column] = self.column_extremes(origins, sizes, bar_indices, face_index == 0)[order]
+
+        brushes = [brush for function_brushes in self.brushes for brush in function_brushes]
+        cuboids, columns = np.nonzero(ordered)
+        faces = [(QPolygonF([QPointF(x, y) for x, y in quad]), brushes[brush_index])
+                 for quad, brush_index in zip(quads[cuboids, columns].tolist(),
+                                              (function_indices[cuboids] * 6 + face_indices[columns]).tolist())]
+
+        batches = []
+        for column in np.flatnonzero(~ordered.any(axis=0)).tolist():
+            for function_index in np.unique(function_indices).tolist():
+                path = QPainterPath()
+                batch_quads = quads[function_indices == function_index, column].tolist()
+                for quad in batch_quads:
+                    path.addPolygon(QPolygonF([QPointF(x, y) for x, y in quad]))
+                    path.closeSubpath()
+                batches.append((path, self.brushes[function_index][face_indices[column]], len(batch_quads)))
+        return faces, batches
+
+    @staticmethod
+    def column_extremes(origins, sizes, bar_indices, top):
         """
-        x, y - положение основания бара на «земле»
-        width, depth - размеры основания
-        segments - список кортежей (height, QColor) для накопления
+        Отмечает верхний (top=True) или нижний сегмент каждого столбца.
+
+        bar_indices - номера баров сегментов, по возрастанию
+        :return: булев массив длины N
+        """
+        starts = np.flatnonzero(np.diff(bar_indices, prepend=-1))
+        counts = np.diff(np.append(starts, len(bar_indices)))
+        if top:
+            edges = origins[:, 2] + sizes[:, 2]
+            return edges == np.repeat(np.maximum.reduceat(edges, starts), counts)
+        edges = origins[:, 2]
+        return edges == np.repeat(np.minimum.reduceat(edges, starts), counts)
+
+    def build_cuboid_faces(self, quads, face_indices, brushes):
+        """
+        Собирает видимые грани одного кубоида по уже спроецированным вершинам.
+
+        quads - по 4 экранные точки на грань, face_indices - номера этих граней в CUBOID_FACES,
+        brushes - кисти граней цвета кубоида (см. shaded_brushes)
+        :return: список (QPolygonF, QBrush) в порядке отрисовки
         """
-        self.x = x
-        self.y = y
-        self.width = width
-        self.depth = depth
-        self.segments = segments
+        return [(QPolygonF([QPointF(x, y) for x, y in quad]), brushes[face_index])
+                for quad, face_index in zip(quads, face_indices)]
 
 
 # Виджет для отрисовки одного графика с возможностью интерактивного вращения и перемещения
 class GraphWidget(QWidget):
+    # Во время вращения и масштабирования бары берутся с уровня детализации во столько раз грубее
+    PREVIEW_COARSENING = 4
+    # Сколько миллисекунд после последнего шага колесика масштабирование считается активным
+    WHEEL_INTERACTION_MS = 250
+    # Сколько последних замеров кадров хранится в frame_history
+    FRAME_HISTORY = 120
+    # Запас в пикселях вокруг окна при отсечении линий сетки: подписи оси X сдвинуты от своих точек
+    AXIS_LABEL_MARGIN = 100
+    # Количество делений оси Z
+    NUM_Z_TICKS = 12
+    # Размеры легенды: отступ от правого края, отступ сверху, размер цветного квадрата, расстояние между элементами
+    LEGEND_WIDTH = 150
+    LEGEND_TOP = 10
+    LEGEND_BOX_SIZE = 20
+    LEGEND_SPACING = 5
+    # Поля слоя легенды: половина толщины outline_pen с округлением вверх, чтобы контуры не обрезались
+    LEGEND_PADDING = 2
+
+    # Сигнал из фонового потока: (камера, готовый кадр QImage)
+    frame_rendered = Signal(object, QImage)
+    # Замеры каждого отрисованного кадра (FrameStats); из фонового потока приходит в GUI-поток
+    frame_profiled = Signal(object)
+
     def __init__(self, bars, x_min=None, x_max=None, z_min=None, z_max=None, x_values=None, legend_items=None,
-                 draw_axes_after=False, parent=None):
+                 draw_axes_after=False, lod=None, background_rendering=True, koef=1.0, performance_overlay=False,
+                 parent=None):
         super().__init__(parent)
-        self.bars = bars
+        self.bars = bars if bars is not None else BarStore([], 0, 0, 0, np.empty((0, 0)), [])
         self.x_values = x_values
+        self.lod = lod  # Уровни детализации (LevelOfDetail); если заданы, бары берутся из них
         self.azimuth = 45
         self.elevation = 30
         self.last_mouse_pos = None
@@ -44,60 +211,263 @@ class GraphWidget(QWidget):
         self.x_max = x_max
         self.z_min = z_min
         self.z_max = z_max
+        self.koef = koef  # Коэффициент масштаба значений функций, нужен для подписей оси Z
         self.legend_items = legend_items if legend_items is not None else []  # Элементы легенды
         self.x_offset = 0  # Смещение по X для перемещения камеры
         self.y_offset = 0  # Смещение по Y для перемещения камеры
+        self._scenes = {}  # BarScene по размеру бина уровня детализации
+
+        # Прогрессивная отрисовка: во время взаимодействия рисуется упрощённый кадр,
+        # полный кадр рендерится в QImage в фоновом потоке
+        self.background_rendering = background_rendering
+        self.interacting = False
+        self._frame = None  # Последний готовый полный кадр
+        self._frame_camera = None  # Камера, для которой он отрисован
+        self._requested_camera = None  # Камера кадра, который ещё отрисовывается в фоне
+        self._render_pool = QThreadPool(self)
+        self._render_pool.setMaxThreadCount(1)
+        self.frame_rendered.connect(self.on_frame_rendered)
+        self._wheel_timer = QTimer(self)
+        self._wheel_timer.setSingleShot(True)
+        self._wheel_timer.setInterval(self.WHEEL_INTERACTION_MS)
+        self._wheel_timer.timeout.connect(self.end_interaction)
+
+        # Замеры производительности: история кадров, частота показа и оверлей с FPS и самым долгим этапом
+        self.performance_overlay = performance_overlay
+        self.frame_history = deque(maxlen=self.FRAME_HISTORY)
+        self.frame_rate = FrameRateMeter()
+
+        # Шрифты и перья создаются один раз, а не на каждом кадре
+        self.axis_font = QFont("Arial", 10, QFont.Bold)
+        self.overlay_font = QFont("Monospace", 9)
+        self.axis_pen = QPen(QColor(50, 50, 50), 5)  # Оси - тёмно-серые, толщина 5px
+        self.grid_pen = QPen(QColor(255, 255, 255), 1, Qt.SolidLine)  # Сетка - белая сплошная линия
+        self.label_pen = QPen(Qt.black, 3)  # Подписи осей
+        self.outline_pen = QPen(Qt.black, 3)  # Контуры граней баров и квадратов легенды
+        self.text_pen = QPen(Qt.black)  # Текст легенды
+        # Кэш слоёв, которые не меняются, пока не сдвинется камера или не сменятся данные:
+        # оси, сетка и подписи - отдельно для упрощённого и полного кадра, легенда - независимо от камеры.
+        # Значения - кортежи (ключ, QImage), чтобы их можно было читать и заменять из разных потоков
+        self._axes_layers = {}
+        self._legend_layer = (None, None)
+        self._z_ticks = (None, None)  # (ключ, список (z, подпись)) делений оси Z
+
+    def camera(self):
+        """Снимок текущего состояния камеры."""
+        return Camera(self.azimuth, self.elevation, self.scale_factor, self.x_offset, self.y_offset,
+                      self.width(), self.height())
 
     def paintEvent(self, event):
+        camera = self.camera()
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
+        if self._frame is not None and self._frame_camera == camera:
+            painter.drawImage(0, 0, self._frame)
+        elif self.interacting or self.background_rendering:
+            self.render_scene(painter, camera, preview=True)
+            if not self.interacting:
+                self.request_frame(camera)
+        else:
+            self.render_scene(painter, camera)
+        self.frame_rate.tick()
+        if self.performance_overlay:
+            self.draw_performance_overlay(painter)
+        painter.end()
+
+    def render_scene(self, painter, camera, preview=False):
+        """
+        Рисует сцену для заданной камеры; не обращается к состоянию камеры виджета.
+
+        preview - упрощённый кадр: без сглаживания, с более грубыми барами и без подписей сетки
+        :return: FrameStats с замерами кадра
+        """
+        frame = FrameStats(preview)
+        if not preview:
+            painter.setRenderHint(QPainter.Antialiasing)
         # Центрирование рисунка в окне
-        center_offset = QPointF(self.width() / 2, self.height() / 2)
+        device_pixel_ratio = painter.device().devicePixelRatioF()
+        with frame.phase("scene"):
+            scene = self.scene_for(camera, preview)
 
         # Рисуем оси на заднем плане, если нужно
         if not self.draw_axes_after:
-            self.draw_axes(painter, center_offset, self.x_min, self.x_max, self.z_min, self.z_max, self.x_values)
+            with frame.phase("axes"):
+                painter.drawImage(0, 0, self.axes_layer(camera, scene, preview, device_pixel_ratio, frame))
+                frame.count("images")
 
         # Отрисовка баров
-        for bar in self.bars:
-            # Разделяем сегменты на положительные и отрицательные
-            positive_base_z = 0  # Начало для положительных сегментов
-            negative_base_z = 0  # Начало для отрицательных сегментов
-            for h, color in bar.segments:
-                if h >= 0:
-                    # Положительный сегмент: рисуем вверх от positive_base_z
-                    self.draw_cuboid(painter, bar.x, bar.y, positive_base_z, bar.width, bar.depth, h, center_offset,
-                                     color)
-                    positive_base_z += h
-                else:
-                    # Отрицательный сегмент: рисуем вниз от negative_base_z
-                    self.draw_cuboid(painter, bar.x, bar.y, negative_base_z, bar.width, bar.depth, h, center_offset,
-                                     color)
-                    negative_base_z += h
+        self.draw_bars(painter, camera, scene, frame)
 
         # Рисуем оси поверх баров, если нужно
         if self.draw_axes_after:
-            self.draw_axes(painter, center_offset, self.x_min, self.x_max, self.z_min, self.z_max, self.x_values)
+            with frame.phase("axes"):
+                painter.drawImage(0, 0, self.axes_layer(camera, scene, preview, device_pixel_ratio, frame))
+                frame.count("images")
 
         # Рисуем легенду
         if self.legend_items:
-            self.draw_legend(painter)
+            with frame.phase("legend"):
+                painter.drawImage(camera.width - self.LEGEND_WIDTH - self.LEGEND_PADDING,
+                                  self.LEGEND_TOP - self.LEGEND_PADDING,
+                                  self.legend_layer(device_pixel_ratio, frame))
+                frame.count("images")
+        self.record_frame(frame.finish())
+        return frame
+
+    def axes_layer(self, camera, scene, preview, device_pixel_ratio=1.0, frame=None):
+        """
+        Слой осей, сетки и подписей в прозрачном QImage размером с окно.
+
+        Перерисовывается, только если изменились камера, сцена, границы осей или коэффициент
+        подписей; иначе кадр лишь накладывает готовое изображение.
+        """
+        key = (camera, scene, self.x_min, self.x_max, self.z_min, self.z_max, self.koef, device_pixel_ratio)
+        cached_key, image = self._axes_layers.get(preview, (None, None))
+        if cached_key != key:
+            image = self.layer_image(camera.width, camera.height, device_pixel_ratio)
+            painter = QPainter(image)
+            if not preview:
+                painter.setRenderHint(QPainter.Antialiasing)
+            # Центрирование рисунка в окне
+            center_offset = QPointF(camera.width / 2, camera.height / 2)
+            self.draw_axes(painter, center_offset, camera, scene.bars, self.x_min, self.x_max, self.z_min,
+                           self.z_max, scene.x_values, labels=not preview, frame=frame, x_label=scene.x_label)
+            painter.end()
+            self._axes_layers[preview] = (key, image)
+        return image
+
+    def legend_layer(self, device_pixel_ratio=1.0, frame=None):
+        """Слой легенды с полями LEGEND_PADDING; перерисовывается только при смене элементов легенды."""
+        key = (tuple((name, color.rgba()) for name, color in self.legend_items), device_pixel_ratio)
+        cached_key, image = self._legend_layer
+        if cached_key != key:
+            height = len(self.legend_items) * (self.LEGEND_BOX_SIZE + self.LEGEND_SPACING)
+            image = self.layer_image(self.LEGEND_WIDTH + 2 * self.LEGEND_PADDING, height + 2 * self.LEGEND_PADDING,
+                                     device_pixel_ratio)
+            painter = QPainter(image)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.translate(self.LEGEND_PADDING, self.LEGEND_PADDING)
+            self.draw_legend(painter, frame)
+            painter.end()
+            self._legend_layer = (key, image)
+        return image
+
+    @staticmethod
+    def layer_image(width, height, device_pixel_ratio):
+        """Пустой прозрачный QImage для кэшируемого слоя."""
+        image = QImage(max(int(width * device_pixel_ratio), 1), max(int(height * device_pixel_ratio), 1),
+                       QImage.Format_ARGB32_Premultiplied)
+        image.setDevicePixelRatio(device_pixel_ratio)
+        image.fill(Qt.transparent)
+        return image
 
+    def z_ticks(self, z_min, z_max):
+        """
+        Деления оси Z: NUM_Z_TICKS + 1 равных шагов от z_min до z_max с готовыми подписями.
+
+        Значения считаются по номеру деления, а не накоплением шага, поэтому количество
+        делений не зависит от ошибок округления. Подписи форматируются один раз на диапазон.
+        """
+        key = (z_min, z_max, self.koef)
+        cached_key, ticks = self._z_ticks
+        if cached_key != key:
+            step = (z_max - z_min) / self.NUM_Z_TICKS
+            values = [z_min + k * step for k in range(self.NUM_Z_TICKS + 1)]
+            ticks = [(z, f"{z / self.koef:.2f}") for z in values]
+            self._z_ticks = (key, ticks)
+        return ticks
+
+    def record_frame(self, frame):
+        """Сохраняет замеры кадра в историю, пишет их в журнал и отправляет сигнал frame_profiled."""
+        self.frame_history.append(frame)
+        # Строка замеров собирается, только если отладочный журнал включён
+        logging.debug("%s: %s", type(self).__name__, frame)
+        self.frame_profiled.emit(frame)
+
+    def draw_performance_overlay(self, painter):
+        """Рисует в левом верхнем углу частоту кадров и самый долгий этап последнего отрисованного кадра."""
+        lines = [f"FPS: {self.frame_rate.fps():.1f}"]
+        if self.frame_history:
+            frame = self.frame_history[-1]
+            name, seconds = frame.slowest_phase()
+            lines.append(f"Кадр: {frame.total * 1000:.1f} мс" + (" (упрощённый)" if frame.preview else ""))
+            lines.append(f"Дольше всего: {name} {seconds * 1000:.1f} мс")
+            lines.append(f"Полигонов: {frame.counts['polygons']}, линий: {frame.counts['lines']}")
+        painter.save()
+        painter.setFont(self.overlay_font)
+        line_height = painter.fontMetrics().height()
+        width = max(painter.fontMetrics().horizontalAdvance(line) for line in lines) + 10
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(255, 255, 255, 200))
+        painter.drawRect(5, 5, width, line_height * len(lines) + 6)
+        painter.setPen(self.text_pen)
+        for i, line in enumerate(lines):
+            painter.drawText(10, 5 + line_height * (i + 1), line)
+        painter.restore()
+
+    def render_image(self, camera, background=None, device_pixel_ratio=1.0):
+        """
+        Рисует полный кадр для камеры в QImage; безопасно вызывать из фонового потока.
+
+        background - цвет заливки; по умолчанию кадр прозрачный и ложится поверх фона родителя
+        """
+        image = QImage(int(camera.width * device_pixel_ratio), int(camera.height * device_pixel_ratio),
+                       QImage.Format_ARGB32_Premultiplied)
+        image.setDevicePixelRatio(device_pixel_ratio)
+        image.fill(background if background is not None else Qt.transparent)
+        painter = QPainter(image)
+        self.render_scene(painter, camera)
         painter.end()
+        return image
+
+    def request_frame(self, camera):
+        """Ставит в очередь фоновую отрисовку полного кадра для камеры."""
+        if self._requested_camera == camera:
+            return
+        self._requested_camera = camera
+        device_pixel_ratio = self.devicePixelRatioF()
+
+        def job():
+            # Камера успела смениться, пока задача ждала в очереди - кадр уже не нужен
+            if self._requested_camera != camera:
+                return
+            self.frame_rendered.emit(camera, self.render_image(camera, device_pixel_ratio=device_pixel_ratio))
+
+        self._render_pool.start(job)
+
+    def on_frame_rendered(self, camera, image):
+        """Показывает готовый кадр, если камера с тех пор не сдвинулась; устаревшие кадры отбрасываются."""
+        if camera != self.camera():
+            # Задача для этой камеры больше не выполняется - при возврате к ней кадр нужно запросить заново
+            if self._requested_camera == camera:
+                self._requested_camera = None
+            return
+        if self._requested_camera == camera:
+            self._requested_camera = None
+        self._frame = image
+        self._frame_camera = camera
+        self.update()
+
+    def end_interaction(self):
+        """Завершает взаимодействие: следующий кадр будет отрисован в полном качестве."""
+        self.interacting = False
+        self.update()
 
-    def draw_legend(self, painter):
-        """Рисует легенду в правом верхнем углу."""
-        legend_x = self.width() - 150  # Отступ от правого края
-        legend_y = 10  # Отступ сверху
-        box_size = 20  # Размер цветного квадрата
-        spacing = 5  # Расстояние между элементами
+    def draw_legend(self, painter, frame=None):
+        """Рисует легенду от точки (0, 0) painter; на экране она ставится в правый верхний угол."""
+        box_size = self.LEGEND_BOX_SIZE
+        spacing = self.LEGEND_SPACING
+        painter.setFont(self.axis_font)
         for i, (name, color) in enumerate(self.legend_items):
             # Цветной квадрат
+            painter.setPen(self.outline_pen)
             painter.setBrush(QBrush(color))
-            painter.drawRect(legend_x, legend_y + i * (box_size + spacing), box_size, box_size)
+            painter.drawRect(0, i * (box_size + spacing), box_size, box_size)
             # Текст
-            painter.setPen(QPen(Qt.black))
-            painter.drawText(legend_x + box_size + 5, legend_y + i * (box_size + spacing) + box_size / 2 + 5, name)
+            painter.setPen(self.text_pen)
+            painter.drawText(box_size + 5, i * (box_size + spacing) + box_size / 2 + 5, name)
+        if frame is not None:
+            frame.count("polygons", len(self.legend_items))
+            frame.count("texts", len(self.legend_items))
 
     def wheelEvent(self, event):
         """Обрабатывает прокрутку колесика мыши для масштабирования графика."""
@@ -107,133 +477,154 @@ class GraphWidget(QWidget):
             self.scale_factor *= (1 + scale_step)
         else:
             self.scale_factor /= (1 + scale_step)
+        self.interacting = True
+        self._wheel_timer.start()
         self.update()
 
-    def project_point(self, x, y, z, offset):
+    def project_point(self, x, y, z, offset, camera):
         """Проецирует 3D точку на 2D экран с учётом вращения, масштабирования и смещения."""
-        rad_az = math.radians(self.azimuth)
+        rad_az = math.radians(camera.azimuth)
         X1 = x * math.cos(rad_az) - y * math.sin(rad_az)
         Y1 = x * math.sin(rad_az) + y * math.cos(rad_az)
         Z1 = z
-        rad_el = math.radians(self.elevation)
+        rad_el = math.radians(camera.elevation)
         Y2 = Y1 * math.cos(rad_el) - Z1 * math.sin(rad_el)
         Z2 = Y1 * math.sin(rad_el) + Z1 * math.cos(rad_el)
         # Добавляем смещение камеры
-        screen_x = X1 * self.scale_factor + offset.x() + self.x_offset
-        screen_y = Y2 * self.scale_factor + offset.y() + self.y_offset
+        screen_x = X1 * camera.scale_factor + offset.x() + camera.x_offset
+        screen_y = Y2 * camera.scale_factor + offset.y() + camera.y_offset
         return QPointF(screen_x, screen_y)
 
-    def draw_cuboid(self, painter, x, y, z, w, d, h, offset, color):
-        vertices = {}
-        vertices['A'] = self.project_point(x, y, z, offset)
-        vertices['B'] = self.project_point(x + w, y, z, offset)
-        vertices['C'] = self.project_point(x + w, y + d, z, offset)
-        vertices['D'] = self.project_point(x, y + d, z, offset)
-        vertices['E'] = self.project_point(x, y, z + h, offset)
-        vertices['F'] = self.project_point(x + w, y, z + h, offset)
-        vertices['G'] = self.project_point(x + w, y + d, z + h, offset)
-        vertices['H'] = self.project_point(x, y + d, z + h, offset)
-
-        # Определяем грани
-        top_face = [vertices[k] for k in ['E', 'F', 'G', 'H']]  # Верхняя грань
-        bottom_face = [vertices[k] for k in ['A', 'B', 'C', 'D']]  # Нижняя грань
-        right_face = [vertices[k] for k in ['B', 'C', 'G', 'F']]  # Правая грань
-        left_face = [vertices[k] for k in ['A', 'D', 'H', 'E']]  # Левая грань
-        front_face = [vertices[k] for k in ['A', 'B', 'F', 'E']]  # Передняя грань
-        back_face = [vertices[k] for k in ['D', 'C', 'G', 'H']]  # Задняя грань
-
-        # Определяем порядок отрисовки граней в зависимости от угла обзора
-        faces = [
-            (top_face, color.lighter(120)),  # Верхняя грань
-            (bottom_face, color.darker(180)),  # Нижняя грань
-            (right_face, color.darker(120)),  # Правая грань
-            (left_face, color),  # Левая грань
-            (front_face, color.darker(150)),  # Передняя грань
-            (back_face, color.darker(100))  # Задняя грань
-        ]
+    def scene_for(self, camera, preview=False):
+        """Возвращает BarScene уровня детализации, подходящего для масштаба и ширины камеры."""
+        if self.lod is None:
+            bin_size = 1
+        else:
+            # Видимая часть данных оценивается по обзорному уровню: при приближении бины
+            # становятся мельче, а количество видимых баров остаётся ограниченным
+            overview_bin_size = self.lod.overview_bin_size()
+            start, stop = self.level_scene(overview_bin_size).visible_range(camera)
+            bin_size = self.lod.bin_size_for(camera.scale_factor, camera.width, (stop - start) * overview_bin_size)
+            if preview:
+                bin_size = self.lod.coarser(bin_size, self.PREVIEW_COARSENING)
+        return self.level_scene(bin_size)
 
-        # Простая сортировка граней по средней Z-координате (для корректного наложения)
-        # Мы будем использовать среднюю Y-координату на экране (в 2D) как индикатор глубины
-        def get_face_depth(face):
-            avg_y = sum(point.y() for point in face) / len(face)
-            return avg_y
+    def level_scene(self, bin_size):
+        """BarScene уровня детализации с заданным размером бина; сцены кэшируются."""
+        scene = self._scenes.get(bin_size)
+        if scene is None:
+            if self.lod is None:
+                bars, x_values = self.bars, self.x_values
+            else:
+                bars, level_data = self.lod.level(bin_size)
+                x_values = level_data["x"]
+            scene = self._scenes[bin_size] = BarScene(bars, x_values)
+        return scene
 
-        # Сортируем грани: те, что дальше (с большим значением Y на экране), рисуем первыми
-        faces.sort(key=lambda f: get_face_depth(f[0]), reverse=True)
+    def draw_bars(self, painter, camera, scene, frame=None):
+        """
+        Рисует грани всех сегментов из кэша сцены.
 
-        # Отрисовываем грани в отсортированном порядке
-        for face, face_color in faces:
-            painter.setBrush(QBrush(face_color))
-            painter.drawPolygon(QPolygonF(face))
+        Перемещение камеры (x_offset, y_offset) применяется как сдвиг painter
+        и проекцию не пересчитывает. В frame замеряются отдельно проекция граней
+        (этап projection, почти бесплатный при попадании в кэш) и их отрисовка (этап bars).
+        """
+        frame = frame if frame is not None else FrameStats()
+        with frame.phase("projection"):
+            faces, batches = scene.faces(camera)
+        with frame.phase("bars"):
+            painter.save()
+            painter.translate(camera.x_offset, camera.y_offset)
+            painter.setPen(self.outline_pen)
+            # Кисть меняется только тогда, когда она отличается от предыдущей
+            current_brush = None
+            for polygon, brush in faces:
+                if brush is not current_brush:
+                    painter.setBrush(brush)
+                    current_brush = brush
+                painter.drawPolygon(polygon)
+            for path, brush, _ in batches:
+                painter.setBrush(brush)
+                painter.drawPath(path)
+            painter.restore()
+        frame.count("polygons", len(faces) + sum(num_faces for _, _, num_faces in batches))
+        frame.count("draw_calls", len(faces) + len(batches))
 
-    def draw_axes(self, painter, offset, x_min, x_max, z_min, z_max, x_values, x_tick_step=2):
-        if not self.bars:
+    def draw_axes(self, painter, offset, camera, bars, x_min, x_max, z_min, z_max, x_values, x_tick_step=2,
+                  labels=True, frame=None, x_label=None):
+        """x_label - функция номер бара -> подпись оси X (например, BarScene.x_label с кэшем строк)"""
+        if not len(bars):
             return
-        painter.setFont(QFont("Arial", 10, QFont.Bold))
-        # Цвет осей - тёмно-серый, толщина 5px
-        axis_pen = QPen(QColor(50, 50, 50), 5)
-        painter.setPen(axis_pen)
+        frame = frame if frame is not None else FrameStats()
+        x_label = x_label if x_label is not None else (lambda index: f"{x_values[index]:.1f}")
+        # Линии сетки и подписи рисуются только для баров, попадающих в окно (с запасом на подписи)
+        start, stop = bars.index_range(*visible_x_range(camera, (0, 0), (min(z_min, 0), max(z_max, 0)),
+                                                        margin=self.AXIS_LABEL_MARGIN))
+        stop = min(stop, len(x_values))
+        first_tick = -(-start // x_tick_step) * x_tick_step  # Первый номер, кратный шагу сетки
+        bar_centers = bars.centers(first_tick, stop)
+        painter.setFont(self.axis_font)
+        painter.setPen(self.axis_pen)
 
         # Определяем начальную точку (левый нижний угол)
-        origin = self.project_point(x_min, 0, 0, offset)
+        origin = self.project_point(x_min, 0, 0, offset, camera)
 
         # Ось X
-        x_end = self.project_point(x_max, 0, 0, offset)
+        x_end = self.project_point(x_max, 0, 0, offset, camera)
         painter.drawLine(origin, x_end)
         self.draw_arrow(painter, origin, x_end)
 
         # Ось Z (ось Y)
-        z_end = self.project_point(x_min, 0, z_max, offset)
+        z_end = self.project_point(x_min, 0, z_max, offset, camera)
         painter.drawLine(origin, z_end)
         self.draw_arrow(painter, origin, z_end)
+        frame.count("lines", 6)  # Две оси и по две линии на стрелку
 
         # Вспомогательная сетка с контрастным цветом и сплошными линиями
-        grid_pen = QPen(QColor(255, 255, 255), 1, Qt.SolidLine)  # Белый цвет, сплошная линия
-        painter.setPen(grid_pen)
+        painter.setPen(self.grid_pen)
 
         # Вертикальные линии сетки (по X)
-        for i in range(0, len(x_values), x_tick_step):
-            x_pos = self.bars[i].x + self.bars[i].width / 2
-            grid_start = self.project_point(x_pos, 0, z_min, offset)
-            grid_end = self.project_point(x_pos, 0, z_max, offset)
+        for x_pos in bar_centers[::x_tick_step].tolist():
+            grid_start = self.project_point(x_pos, 0, z_min, offset, camera)
+            grid_end = self.project_point(x_pos, 0, z_max, offset, camera)
             painter.drawLine(grid_start, grid_end)
+            frame.count("lines")
 
         # Добавляем последнюю вертикальную линию сетки для последнего бара
-        last_x_pos = self.bars[-1].x + self.bars[-1].width / 2
-        last_grid_start = self.project_point(last_x_pos, 0, z_min, offset)
-        last_grid_end = self.project_point(last_x_pos, 0, z_max, offset)
+        last_x_pos = bars.centers(len(bars) - 1)[0]
+        last_grid_start = self.project_point(last_x_pos, 0, z_min, offset, camera)
+        last_grid_end = self.project_point(last_x_pos, 0, z_max, offset, camera)
         painter.drawLine(last_grid_start, last_grid_end)
+        frame.count("lines")
 
-        # Горизонтальные линии сетки (по Z) с большим количеством линий
-        num_z_ticks = 12  # Увеличиваем количество линий
-        tick_interval_z = (z_max - z_min) / num_z_ticks
-        current_z = z_min-1
-        while current_z <= z_max:
-            grid_start = self.project_point(x_min, 0, current_z, offset)
-            grid_end = self.project_point(last_x_pos, 0, current_z, offset)  # Исправляем: убираем x_pos
+        # Горизонтальные линии сетки (по Z) на делениях оси Z
+        z_ticks = self.z_ticks(z_min, z_max)
+        for current_z, _ in z_ticks:
+            grid_start = self.project_point(x_min, 0, current_z, offset, camera)
+            grid_end = self.project_point(last_x_pos, 0, current_z, offset, camera)
             painter.drawLine(grid_start, grid_end)
-            current_z += tick_interval_z
+        frame.count("lines", len(z_ticks))
 
+        # В упрощённом кадре подписи не рисуем
+        if not labels:
+            return
         # Подписи оси X
-        painter.setPen(QPen(Qt.black, 3))
-        for i in range(0, len(x_values), x_tick_step):
-            x_pos = self.bars[i].x + self.bars[i].width / 2
-            tick_pt = self.project_point(x_pos, 0, 0, offset)
-            painter.drawText(tick_pt + QPointF(-10, 75), f"{x_values[i]:.1f}")
+        painter.setPen(self.label_pen)
+        for i, x_pos in zip(range(first_tick, stop, x_tick_step), bar_centers[::x_tick_step].tolist()):
+            tick_pt = self.project_point(x_pos, 0, 0, offset, camera)
+            painter.drawText(tick_pt + QPointF(-10, 75), x_label(i))
+            frame.count("texts")
 
         # Добавляем последнюю метку вручную, если она не попадает в цикл
-        last_x_pos = self.bars[-1].x + self.bars[-1].width / 2
-        last_tick_pt = self.project_point(last_x_pos, 0, 0, offset)
-        painter.drawText(last_tick_pt + QPointF(-10, 75), f"{x_values[-1]:.1f}")
+        last_tick_pt = self.project_point(last_x_pos, 0, 0, offset, camera)
+        painter.drawText(last_tick_pt + QPointF(-10, 75), x_label(len(x_values) - 1))
+        frame.count("texts")
 
         # Подписи оси Z (или ось Y = значения функций)
-        painter.setPen(QPen(Qt.black, 3))
-        tick_interval_z = (z_max - z_min) / num_z_ticks  # Шаг разметки
-        current_z = z_min  # Начинаем с минимального значения
-        while current_z <= z_max + tick_interval_z / 2:  # Добавляем небольшой запас для включения z_max
-            tick_pt = self.project_point(x_min, 0, current_z, offset)
-            painter.drawText(tick_pt + QPointF(-35, 0), f"{current_z / koef:.2f}")
-            current_z += tick_interval_z
+        for current_z, label in z_ticks:
+            tick_pt = self.project_point(x_min, 0, current_z, offset, camera)
+            painter.drawText(tick_pt + QPointF(-35, 0), label)
+        frame.count("texts", len(z_ticks))
 
     def draw_arrow(self, painter, start, end):
         line_vec = QPointF(end.x() - start.x(), end.y() - start.y())
@@ -256,6 +647,11 @@ class GraphWidget(QWidget):
 
     def mousePressEvent(self, event):
         self.last_mouse_pos = event.pos()
+        self.interacting = True
+
+    def mouseReleaseEvent(self, event):
+        self.last_mouse_pos = None
+        self.end_interaction()
 
     def mouseMoveEvent(self, event):
         if self.last_mouse_pos is not None:
@@ -273,82 +669,359 @@ class GraphWidget(QWidget):
             self.update()
 
 
-def generate_bars_from_data(data, bar_width=10, bar_depth=10, scale=koef, bar_spacing=5):
-    bars = []
+# Сцена потокового режима: грани кэшируются по барам, новые бары достраиваются, вытесненные удаляются
+class StreamScene(BarScene):
+    def __init__(self, colors, bar_width=10, bar_depth=10, bar_spacing=2):
+        super().__init__(BarStore([], 0, 0, 0, np.empty((0, len(colors))), colors), np.empty(0))
+        self.colors = colors
+        self.bar_width = bar_width
+        self.bar_depth = bar_depth
+        # Бар отсчёта с номером n стоит в x = n * bar_pitch, поэтому при сдвиге окна
+        # уже спроецированные бары остаются на своих местах
+        self.bar_pitch = bar_width + bar_spacing
+        self.first_sequence = 0
+        self.koef = None
+        self._buffer = None
+        self._bar_faces = deque()  # (номер отсчёта, грани бара) по возрастанию номера
+        self._camera = None  # Камера, для которой спроецированы грани в _bar_faces
+
+    def bar_store(self, first_sequence, values):
+        """BarStore для отсчётов с номерами от first_sequence."""
+        x_positions = (first_sequence + np.arange(len(values))) * self.bar_pitch
+        return BarStore(x_positions, 0, self.bar_width, self.bar_depth, values * self.koef, self.colors)
+
+    def set_window(self, buffer, koef):
+        """
+        Переходит к текущему окну буфера.
+
+        Грани вытесненных баров удаляются, грани новых баров проецируются и добавляются;
+        остальные остаются в кэше. При смене koef меняются все высоты, и кэш сбрасывается.
+        """
+        if koef != self.koef:
+            self.koef = koef
+            self._bar_faces.clear()
+            self._camera = None
+        self._buffer = buffer
+        self.first_sequence = buffer.first_sequence
+        self.x_values, values = buffer.window()
+        # Подписи закэшированы по номеру в окне, а окно сдвинулось
+        self._x_labels.clear()
+        self.bars = self.bar_store(self.first_sequence, values)
+
+        while self._bar_faces and self._bar_faces[0][0] < self.first_sequence:
+            self._bar_faces.popleft()
+        if self._camera is not None:
+            next_sequence = max(self._bar_faces[-1][0] + 1 if self._bar_faces else 0, self.first_sequence)
+            self._bar_faces.extend(self.build_bar_faces(next_sequence, buffer.total, self._camera))
+
+    def faces(self, camera):
+        """
+        Грани окна в порядке отрисовки, в том же виде (faces, batches), что у BarScene.build_faces.
+
+        Полностью перепроецируются только при смене camera.projection_key().
+        """
+        if self._camera is None or self._camera.projection_key() != camera.projection_key():
+            self._bar_faces = deque(self.build_bar_faces(self.first_sequence, self.first_sequence + len(self.bars),
+                                                         camera))
+            self._camera = camera
+        # Бары разделены плоскостями, перпендикулярными X: если камера со стороны больших X,
+        # новые бары ближе и рисуются последними
+        bar_faces = self._bar_faces if view_direction(camera.azimuth, camera.elevation)[0] >= 0 \
+            else reversed(self._bar_faces)
+        return [face for _, faces in bar_faces for face in faces], []
+
+    def build_bar_faces(self, start_sequence, stop_sequence, camera):
+        """Проецирует бары с номерами [start_sequence, stop_sequence) и группирует их видимые грани по барам."""
+        if stop_sequence <= start_sequence or self._buffer is None:
+            return []
+        _, values = self._buffer.get(start_sequence, stop_sequence)
+        bars = self.bar_store(start_sequence, values)
+        origins, sizes, function_indices, bar_indices = build_cuboids(bars)
+        screen = project_vertices(cuboid_vertices(origins, sizes), camera.azimuth, camera.elevation,
+                                  camera.scale_factor, camera.width / 2, camera.height / 2)
+
+        # Внутри бара сегменты сортируются вдоль Z от дальних к ближним
+        toward_camera = view_direction(camera.azimuth, camera.elevation)
+        order = np.lexsort(((origins[:, 2] + sizes[:, 2] / 2) * toward_camera[2], bar_indices))
+        face_indices = visible_faces(camera.azimuth, camera.elevation)
+        quads = screen[order[:, None, None], CUBOID_FACES[face_indices][None, :, :]]
+
+        bar_faces = [(start_sequence + i, []) for i in range(len(bars))]
+        face_indices = face_indices.tolist()
+        for cuboid_quads, function_index, bar_index in zip(quads.tolist(), function_indices[order].tolist(),
+                                                            bar_indices[order].tolist()):
+            bar_faces[bar_index][1].extend(
+                self.build_cuboid_faces(cuboid_quads, face_indices, self.brushes[function_index]))
+        return bar_faces
+
+
+# Виджет потокового режима: показывает скользящее окно последних отсчётов источника
+class StreamingGraphWidget(GraphWidget):
+    # koef меняется, только если новое значение отличается больше чем на эту долю,
+    # иначе бары перестраивались бы почти на каждом отсчёте
+    KOEF_HYSTERESIS = 0.25
+
+    def __init__(self, source, capacity=500, function_names=None, fps=30, bar_width=10, bar_depth=10,
+                 bar_spacing=2, base_target_height=50, parent=None):
+        """
+        source - StreamSource, из которого забираются отсчёты
+        capacity - размер скользящего окна (количество последних отсчётов)
+        fps - частота, с которой забираются отсчёты и перерисовывается график
+        """
+        super().__init__(None, background_rendering=False, parent=parent)
+        self.source = source
+        self.capacity = capacity
+        self.function_names = function_names
+        self.bar_width = bar_width
+        self.bar_depth = bar_depth
+        self.bar_spacing = bar_spacing
+        self.base_target_height = base_target_height
+        self.buffer = None  # Создаётся по первому отсчёту, когда известно количество функций
+        self.stream_stats = None
+        self.stream_scene = None
+        self._poll_timer = QTimer(self)
+        self._poll_timer.timeout.connect(self.poll_stream)
+        self._poll_timer.start(int(1000 / fps))
+
+    def poll_stream(self):
+        """Забирает накопившиеся отсчёты и обновляет окно, статистики и затронутые бары."""
+        samples = self.source.drain()
+        if samples is None:
+            return
+        x_values, values = samples
+        if self.buffer is None:
+            self.start_stream(values.shape[1])
+
+        start_sequence = self.buffer.append(x_values, values)
+        # В окно попадает только хвост пачки, больше статистикам знать не нужно
+        keep = min(len(x_values), self.capacity)
+        self.stream_stats.update(start_sequence + len(x_values) - keep, x_values[-keep:], values[-keep:])
+        self.stream_stats.evict(self.buffer.first_sequence)
+        stats = self.stream_stats.snapshot()
+
+        if self.stream_scene.koef is None or abs(stats.koef - self.koef) > self.KOEF_HYSTERESIS * self.koef:
+            self.koef = stats.koef
+        self.stream_scene.set_window(self.buffer, self.koef)
+        self.z_min = stats.z_min * self.koef
+        self.z_max = stats.z_max * self.koef
+        bars = self.stream_scene.bars
+        self.x_min = bars.x[0]
+        self.x_max = bars.x[-1] + bars.width[-1]
+        self.update()
+
+    def start_stream(self, num_functions):
+        names = self.function_names or [f"f{i + 1}" for i in range(num_functions)]
+        self.function_names = names[:num_functions] + [f"f{i + 1}" for i in range(len(names), num_functions)]
+        colors = [FUNCTION_COLORS[j % len(FUNCTION_COLORS)] for j in range(num_functions)]
+        self.legend_items = list(zip(self.function_names, colors))
+        self.buffer = RingBuffer(self.capacity, num_functions)
+        self.stream_stats = StreamStats(self.function_names, self.base_target_height)
+        self.stream_scene = StreamScene(colors, self.bar_width, self.bar_depth, self.bar_spacing)
+
+    def scene_for(self, camera, preview=False):
+        if self.stream_scene is None:
+            return super().scene_for(camera, preview)
+        return self.stream_scene
+
+    def render_scene(self, painter, camera, preview=False):
+        return super().render_scene(painter, self.follow_window(camera), preview)
+
+    def follow_window(self, camera):
+        """Сдвигает камеру так, чтобы середина окна оставалась в центре экрана."""
+        if self.stream_scene is None:
+            return camera
+        center_x = (self.x_min + self.x_max) / 2
+        rotation = rotation_matrix(camera.azimuth, camera.elevation)
+        return camera._replace(x_offset=camera.x_offset - center_x * rotation[0, 0] * camera.scale_factor,
+                               y_offset=camera.y_offset - center_x * rotation[1, 0] * camera.scale_factor)
+
+
+def generate_bars_from_data(data, bar_width=10, bar_depth=10, scale=1.0, bar_spacing=5):
+    """Строит BarStore: по бару на каждое значение x, по сегменту на каждую функцию."""
     x_values = data["x"]
     functions = data["functions"]
 
-    colors = [QColor(200, 0, 0), QColor(0, 0, 200), QColor(0, 200, 0)]
+    colors = FUNCTION_COLORS
     function_names = list(functions.keys())
 
+    heights = np.empty((len(x_values), len(function_names)), dtype=np.float64)
+    for j, func_name in enumerate(function_names):
+        np.multiply(functions[func_name], scale, out=heights[:, j])
+
     # Сдвигаем начальную позицию влево, добавляя отрицательное смещение
     x_offset = -5
-    for i, x in enumerate(x_values):
-        y = 0
-        # Разделяем значения на положительные и отрицательные
-        positive_segments = []  # Для значений > 0
-        negative_segments = []  # Для значений < 0
-
-        for j, func_name in enumerate(function_names):
-            value = functions[func_name][i] * scale
-            if value >= 0:
-                positive_segments.append((value, colors[j % len(colors)]))
-            else:
-                negative_segments.append((value, colors[j % len(colors)]))
+    x_positions = x_offset + np.arange(len(x_values)) * (bar_width + bar_spacing)
+    return BarStore(x_positions, 0, bar_width, bar_depth, heights,
+                    [colors[j % len(colors)] for j in range(len(function_names))], function_names)
+
+
+def prepare_dataset(filename, bar_width=10, bar_spacing=2, initial_scale=1.0, initial_width=800):
+    """
+    Загружает данные и готовит всё, что нужно вкладкам: диапазоны, коэффициент и уровни детализации.
 
-        # Собираем итоговые сегменты
-        segments = []
-        # Сначала добавляем отрицательные сегменты (вниз от z=0)
-        base_z = 0
-        for value, color in negative_segments:
-            segments.append((value, color))
-            base_z += value  # base_z становится отрицательным
+    Не создаёт виджетов, поэтому выполняется в фоновом потоке. Уровень детализации для
+    начальной камеры строится здесь же, чтобы первая отрисовка не ждала генерации баров.
+    """
+    data = load_data(filename)
+    # Все статистики считаются за один проход и хранятся в записи набора данных
+    stats = compute_stats(data, 50)
+    #Это коэффициент от которого зависит масштаб
+    koef = stats.koef
+    logging.info("Коэффициент масштабирования: %s", koef)
+    logging.info("Значения x min: %s, x max: %s", stats.x_min, stats.x_max)
+    logging.info("Значения z min: %s, z max: %s", stats.z_min, stats.z_max)
 
-        # Добавляем положительные сегменты (вверх от z=0)
-        base_z = 0  # Сбрасываем base_z на 0
-        for value, color in positive_segments:
-            segments.append((value, color))
-            base_z += value
+    # Создаём элементы легенды
+    colors = FUNCTION_COLORS
+    function_names = list(data["functions"].keys())
+    legend_items = list(zip(function_names, colors[:len(function_names)]))
 
-        # Вычисляем x_position с учётом смещения
-        x_position = x_offset + i * (bar_width + bar_spacing)
-        bars.append(Bar(x_position, y, bar_width, bar_depth, segments))
+    # Бары строятся уровнями детализации: при отдалении соседние x объединяются в один бар
+    lod = LevelOfDetail(
+        data,
+        lambda level_data, bin_size: generate_bars_from_data(
+            level_data, bar_width=bin_size * (bar_width + bar_spacing) - bar_spacing, scale=koef,
+            bar_spacing=bar_spacing),
+        bar_pitch=bar_width + bar_spacing)
+    lod.level(lod.bin_size_for(initial_scale, initial_width))
 
-    return bars
+    return {
+        "data": data,
+        "koef": koef,
+        "stats": stats,
+        "x_min": stats.x_min,
+        "x_max": stats.x_max,
+        "z_min": stats.z_min * koef,
+        "z_max": stats.z_max * koef,
+        "legend_items": legend_items,
+        "lod": lod,
+    }
+
+
+def create_graph_widget(dataset, **kwargs):
+    """GraphWidget для набора данных из prepare_dataset; kwargs передаются в конструктор GraphWidget."""
+    return GraphWidget(None, dataset["x_min"], dataset["x_max"], dataset["z_min"], dataset["z_max"], None,
+                       dataset["legend_items"], lod=dataset["lod"], koef=dataset["koef"], **kwargs)
+
+
+# Вкладка, которая создаёт своё содержимое только при первом показе
+class LazyTab(QWidget):
+    def __init__(self, factory, placeholder_text="Загрузка данных...", parent=None):
+        """factory - функция без аргументов, возвращающая виджет содержимого вкладки"""
+        super().__init__(parent)
+        self.factory = factory
+        self.content = None
+        self.placeholder = QLabel(placeholder_text)
+        self.placeholder.setAlignment(Qt.AlignCenter)
+        self.content_layout = QVBoxLayout(self)
+        self.content_layout.setContentsMargins(0, 0, 0, 0)
+        self.content_layout.addWidget(self.placeholder)
+
+    def set_placeholder_text(self, text):
+        self.placeholder.setText(text)
+
+    def activate(self):
+        """Создаёт содержимое вместо заглушки, если это ещё не сделано."""
+        if self.content is not None:
+            return
+        self.content = self.factory()
+        self.content_layout.removeWidget(self.placeholder)
+        self.placeholder.deleteLater()
+        self.content_layout.addWidget(self.content)
 
 
 # Главное окно с вкладками
 class MainWindow(QMainWindow):
-    def __init__(self):
+    # Сигналы фоновой загрузки: подготовленный набор данных или текст ошибки
+    data_loaded = Signal(object)
+    data_failed = Signal(str)
+
+    def __init__(self, data_file="data5.json", stream=None, stream_window=500, profile=False):
+        """
+        data_file - файл данных (.json или .bin)
+        stream - описание источника потока (см. streaming.open_stream_source); если задано,
+                 вместо файла показывается скользящее окно из stream_window последних отсчётов
+        profile - показывать на графиках оверлей с FPS и самым долгим этапом кадра
+        """
         super().__init__()
         self.setWindowTitle("3D Гистограмма с накоплением и вращением")
         self.tab_widget = QTabWidget()
         self.setCentralWidget(self.tab_widget)
-        self.initUI(data)
+        self.data_file = data_file
+        self.stream = stream
+        self.stream_window = stream_window
+        self.profile = profile
+        self.dataset = None
+        self.data_ready = False
+        self.data_loaded.connect(self.on_data_loaded)
+        self.data_failed.connect(self.on_data_failed)
+        self.tab_widget.currentChanged.connect(self.activate_tab)
+        self.initUI()
+        if stream is None:
+            # Загрузка начинается, когда окно уже показано и запущен цикл событий
+            QTimer.singleShot(0, self.start_loading)
+        else:
+            # Потоковому режиму нечего загружать заранее
+            self.data_ready = True
+            QTimer.singleShot(0, lambda: self.activate_tab(self.tab_widget.currentIndex()))
 
-    def initUI(self, data):
-        x_min, x_max = get_x_range(data["x"])
-        z_min, z_max = get_function_range(data["functions"])
-        print("Значения x min:" , x_min , "\nЗначение x max:" , x_max)
-        print("Значение z min:" , z_min, "\nЗначение z max:" , z_max)
-        z_min *= koef
-        z_max *= koef
+    def initUI(self):
+        if self.stream is not None:
+            self.tab_widget.addTab(LazyTab(self.create_stream_graph), "Stream")
+            return
+        self.tab_widget.addTab(LazyTab(self.create_stacked_graph), "Stacked Demo")
+
+    def start_loading(self):
+        """Загружает данные и строит бары в фоновом потоке."""
+        data_file = self.data_file
+
+        def job():
+            try:
+                dataset = prepare_dataset(data_file)
+            except Exception as e:
+                self.data_failed.emit(f"Не удалось загрузить {data_file}: {e}")
+                return
+            self.data_loaded.emit(dataset)
+
+        QThreadPool.globalInstance().start(job)
 
-        # Создаём элементы легенды
-        colors = [QColor(200, 0, 0), QColor(0, 0, 200), QColor(0, 200, 0)]
-        function_names = list(data["functions"].keys())
-        legend_items = list(zip(function_names, colors[:len(function_names)]))
+    def on_data_loaded(self, dataset):
+        self.dataset = dataset
+        self.data_ready = True
+        self.activate_tab(self.tab_widget.currentIndex())
+
+    def on_data_failed(self, message):
+        logging.error(message)
+        for index in range(self.tab_widget.count()):
+            self.tab_widget.widget(index).set_placeholder_text(message)
+
+    def activate_tab(self, index):
+        """Создаёт GraphWidget вкладки при её первом показе, если данные уже загружены."""
+        if not self.data_ready or index < 0:
+            return
+        self.tab_widget.widget(index).activate()
 
-        bars_stacked = generate_bars_from_data(data, bar_spacing=2)
-        graph_stacked = GraphWidget(bars_stacked, x_min, x_max, z_min, z_max, data["x"], legend_items,
-                                    draw_axes_after=False)
+    def create_stacked_graph(self):
+        return create_graph_widget(self.dataset, draw_axes_after=False, performance_overlay=self.profile)
 
-        self.tab_widget.addTab(graph_stacked, "Stacked Demo")
+    def create_stream_graph(self):
+        graph = StreamingGraphWidget(open_stream_source(self.stream), capacity=self.stream_window)
+        graph.performance_overlay = self.profile
+        return graph
 
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
-    window = MainWindow()
+    parser = argparse.ArgumentParser(description="3D-гистограмма с накоплением")
+    parser.add_argument("data_file", nargs="?", default="data5.json", help="файл данных (.json или .bin)")
+    parser.add_argument("--stream", help="потоковый режим: -, tail:путь, tcp:хост:порт, unix:путь или pipe:путь")
+    parser.add_argument("--window", type=int, default=500, help="сколько последних отсчётов показывать в потоке")
+    parser.add_argument("--profile", action="store_true",
+                        help="оверлей с FPS и самым долгим этапом кадра, замеры каждого кадра в журнал")
+    args, _ = parser.parse_known_args(app.arguments()[1:])
+    logging.basicConfig(level=logging.DEBUG if args.profile else logging.INFO,
+                        format="%(relativeCreated)d %(message)s")
+    window = MainWindow(args.data_file, args.stream, args.window, args.profile)
     window.resize(800, 600)
     window.show()
     sys.exit(app.exec())
@@ -0,0 +1,76 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class FrameStats:
+    """
+    Замеры одного кадра: время этапов отрисовки и количество нарисованных примитивов.
+
+    Этапы замеряются контекстным менеджером phase(), примитивы учитываются методом count().
+    Объект создаётся на каждый кадр, поэтому кадры из фонового потока и из GUI-потока
+    не смешиваются.
+    """
+
+    # Виды учитываемых примитивов; draw_calls - вызовы отрисовки граней (пакет граней в одном QPainterPath - один вызов)
+    COUNTERS = ("polygons", "lines", "texts", "images", "draw_calls")
+
+    def __init__(self, preview=False):
+        self.preview = preview  # Упрощённый кадр (во время взаимодействия)
+        self.phases = {}  # Имя этапа -> время в секундах, в порядке выполнения
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+        self.total = 0.0  # Время всего кадра в секундах
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        """Замеряет этап; время повторяющихся этапов складывается."""
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, kind, number=1):
+        self.counts[kind] += number
+
+    def finish(self):
+        """Фиксирует общее время кадра; вызывается после отрисовки."""
+        self.total = time.perf_counter() - self._start
+        return self
+
+    def slowest_phase(self):
+        """:return: (имя этапа, время в секундах) или (None, 0.0), если этапов не было"""
+        if not self.phases:
+            return None, 0.0
+        return max(self.phases.items(), key=lambda item: item[1])
+
+    def summary(self):
+        """Строка для журнала: общее время, время этапов и количество примитивов."""
+        phases = ", ".join(f"{name} {seconds * 1000:.1f} мс" for name, seconds in self.phases.items())
+        counts = ", ".join(f"{kind} {number}" for kind, number in self.counts.items())
+        kind = "упрощённый кадр" if self.preview else "кадр"
+        return f"{kind} {self.total * 1000:.1f} мс ({phases}); {counts}"
+
+    def __str__(self):
+        return self.summary()
+
+
+class FrameRateMeter:
+    """Частота кадров по моментам показа кадров за последние window секунд."""
+
+    def __init__(self, window=1.0):
+        self.window = window
+        self._timestamps = deque()
+
+    def tick(self, timestamp=None):
+        timestamp = time.perf_counter() if timestamp is None else timestamp
+        self._timestamps.append(timestamp)
+        while self._timestamps[0] < timestamp - self.window:
+            self._timestamps.popleft()
+
+    def fps(self):
+        if len(self._timestamps) < 2:
+            return 0.0
+        elapsed = self._timestamps[-1] - self._timestamps[0]
+        return (len(self._timestamps) - 1) / elapsed if elapsed > 0 else 0.0
@@ -0,0 +1,85 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Сколько точек обрабатывается за один шаг; ограничивает память при проходе по memmap-файлам
+CHUNK_SIZE = 1 << 20
+
+DatasetStats = namedtuple("DatasetStats", [
+    "x_min", "x_max",  # Диапазон оси X
+    "z_min", "z_max",  # Границы столбцов с накоплением (ноль всегда внутри диапазона)
+    "function_min", "function_max",  # Словари минимумов и максимумов каждой функции
+    "koef",  # Коэффициент масштабирования (см. scale_coefficient)
+])
+
+
+def scale_coefficient(max_value, base_target_height=3):
+    """
+    Вычисляет коэффициент koef по максимальному абсолютному значению функций.
+
+    :param max_value: максимальное абсолютное значение среди всех функций
+    :param base_target_height: базовая целевая высота для масштабирования (по умолчанию 3)
+    :return: коэффициент koef
+    """
+    if max_value == 0:  # Избегаем деления на ноль
+        return 1.0
+    # Если максимальное значение большое (>10), нормализуем его к базовому диапазону
+    if max_value > 10:
+        # Приводим максимальное значение к диапазону около 1 и умножаем на базовую высоту
+        normalization_factor = 1 / (max_value / 10)  # Примерно масштабируем к 10
+        return base_target_height * normalization_factor
+    # Для небольших значений (около 1) используем base_target_height напрямую
+    return base_target_height
+
+
+def function_stats(columns):
+    """
+    Считает границы столбцов с накоплением и минимумы/максимумы функций за один проход.
+
+    Значения обходятся блоками по CHUNK_SIZE точек: в каждом блоке функции собираются
+    в матрицу, и по ней сразу получаются минимумы и максимумы функций и суммы
+    положительных и отрицательных частей столбцов.
+
+    :param columns: список массивов значений функций одинаковой длины
+    :return: (z_min, z_max, function_min, function_max); z_min <= 0 <= z_max
+    """
+    columns = [np.asarray(column, dtype=np.float64) for column in columns]
+    num_points = len(columns[0]) if columns else 0
+    z_min, z_max = 0.0, 0.0
+    function_min = np.full(len(columns), np.inf)
+    function_max = np.full(len(columns), -np.inf)
+    for start in range(0, num_points, CHUNK_SIZE):
+        block = np.stack([column[start:start + CHUNK_SIZE] for column in columns])
+        np.minimum(function_min, block.min(axis=1), out=function_min)
+        np.maximum(function_max, block.max(axis=1), out=function_max)
+        z_max = max(z_max, np.maximum(block, 0).sum(axis=0).max())
+        z_min = min(z_min, np.minimum(block, 0).sum(axis=0).min())
+    return float(z_min), float(z_max), function_min, function_max
+
+
+def compute_stats(data, base_target_height=3):
+    """
+    Считает все статистики набора данных: диапазон X, границы столбцов, минимумы и
+    максимумы функций и коэффициент масштабирования.
+
+    :param data: словарь с данными (x и functions)
+    :param base_target_height: базовая целевая высота для коэффициента масштабирования
+    :return: DatasetStats
+    """
+    x_values = np.asarray(data["x"], dtype=np.float64)
+    function_names = list(data["functions"].keys())
+    z_min, z_max, function_min, function_max = function_stats(
+        [data["functions"][name] for name in function_names])
+
+    finite = np.isfinite(function_min)
+    max_value = max(np.abs(function_min[finite]).max(initial=0), np.abs(function_max[finite]).max(initial=0))
+    return DatasetStats(
+        x_min=float(x_values.min()) if len(x_values) else 0.0,
+        x_max=float(x_values.max()) if len(x_values) else 0.0,
+        z_min=z_min,
+        z_max=z_max,
+        function_min=dict(zip(function_names, function_min.tolist())),
+        function_max=dict(zip(function_names, function_max.tolist())),
+        koef=scale_coefficient(max_value, base_target_height),
+    )
+
@@ -0,0 +1,347 @@
+import abc
+import logging
+import os
+import queue
+import re
+import socket
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from stats import DatasetStats, scale_coefficient
+
+# Разделители значений в строке отсчёта: пробелы, табуляции, запятые или точки с запятой
+SAMPLE_SEPARATOR = re.compile(r"[\s,;]+")
+
+
+class RingBuffer:
+    """
+    Кольцевой буфер фиксированной ёмкости для потоковых отсчётов.
+
+    Каждый отсчёт получает сквозной номер (sequence); в буфере хранятся последние
+    capacity отсчётов, более старые вытесняются.
+    """
+
+    def __init__(self, capacity, num_functions):
+        self.capacity = capacity
+        self.num_functions = num_functions
+        self.x = np.empty(capacity, dtype=np.float64)
+        self.values = np.empty((capacity, num_functions), dtype=np.float64)
+        self.total = 0  # Сколько отсчётов добавлено за всё время
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    @property
+    def first_sequence(self):
+        """Номер самого старого отсчёта в буфере."""
+        return self.total - len(self)
+
+    def append(self, x_values, values):
+        """
+        Добавляет пачку отсчётов.
+
+        :param x_values: массив длины M
+        :param values: матрица M x num_functions
+        :return: номер первого добавленного отсчёта
+        """
+        x_values = np.asarray(x_values, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64).reshape(len(x_values), self.num_functions)
+        start_sequence = self.total
+        # Из пачки больше ёмкости в буфер попадёт только её хвост
+        skip = max(len(x_values) - self.capacity, 0)
+        positions = (np.arange(start_sequence + skip, start_sequence + len(x_values))) % self.capacity
+        self.x[positions] = x_values[skip:]
+        self.values[positions] = values[skip:]
+        self.total += len(x_values)
+        return start_sequence
+
+    def get(self, start_sequence, stop_sequence):
+        """Возвращает (x, values) отсчётов с номерами [start_sequence, stop_sequence) из окна буфера."""
+        start_sequence = max(start_sequence, self.first_sequence)
+        positions = np.arange(start_sequence, max(stop_sequence, start_sequence)) % self.capacity
+        return self.x[positions], self.values[positions]
+
+    def window(self):
+        """Возвращает (x, values) всего окна от старых отсчётов к новым."""
+        return self.get(self.first_sequence, self.total)
+
+
+class SlidingMaximum:
+    """Максимум по скользящему окну: монотонная очередь (номер, значение), O(1) в среднем на отсчёт."""
+
+    def __init__(self):
+        self._queue = deque()
+
+    def push(self, sequence, value):
+        while self._queue and self._queue[-1][1] <= value:
+            self._queue.pop()
+        self._queue.append((sequence, value))
+
+    def evict(self, first_sequence):
+        """Убирает отсчёты с номерами меньше first_sequence."""
+        while self._queue and self._queue[0][0] < first_sequence:
+            self._queue.popleft()
+
+    def value(self, default=0.0):
+        return self._queue[0][1] if self._queue else default
+
+
+class StreamStats:
+    """
+    Статистики скользящего окна, обновляемые по мере поступления отсчётов.
+
+    Отдаёт те же поля, что stats.DatasetStats, но не пересчитывает окно целиком:
+    каждый отсчёт один раз попадает в монотонные очереди и один раз из них уходит.
+    """
+
+    def __init__(self, function_names, base_target_height=3):
+        self.function_names = list(function_names)
+        self.base_target_height = base_target_height
+        self._x_max = SlidingMaximum()
+        self._x_min = SlidingMaximum()  # Хранит -x
+        self._z_max = SlidingMaximum()  # Сумма положительных частей столбца
+        self._z_min = SlidingMaximum()  # Хранит -(сумма отрицательных частей)
+        self._function_max = [SlidingMaximum() for _ in self.function_names]
+        self._function_min = [SlidingMaximum() for _ in self.function_names]  # Хранят -значение
+
+    def update(self, start_sequence, x_values, values):
+        """Учитывает пачку отсчётов с номерами, начиная с start_sequence."""
+        positive_sums = np.maximum(values, 0).sum(axis=1).tolist()
+        negative_sums = np.minimum(values, 0).sum(axis=1).tolist()
+        for offset, (x, row, positive, negative) in enumerate(
+                zip(x_values.tolist(), values.tolist(), positive_sums, negative_sums)):
+            sequence = start_sequence + offset
+            self._x_max.push(sequence, x)
+            self._x_min.push(sequence, -x)
+            self._z_max.push(sequence, positive)
+            self._z_min.push(sequence, -negative)
+            for value, maximum, minimum in zip(row, self._function_max, self._function_min):
+                maximum.push(sequence, value)
+                minimum.push(sequence, -value)
+
+    def evict(self, first_sequence):
+        """Забывает отсчёты, вытесненные из окна."""
+        for tracker in (self._x_max, self._x_min, self._z_max, self._z_min,
+                        *self._function_max, *self._function_min):
+            tracker.evict(first_sequence)
+
+    def snapshot(self):
+        """Текущие статистики окна в виде DatasetStats."""
+        function_max = {name: tracker.value() for name, tracker in zip(self.function_names, self._function_max)}
+        function_min = {name: -tracker.value() for name, tracker in zip(self.function_names, self._function_min)}
+        max_value = max([abs(value) for value in (*function_max.values(), *function_min.values())], default=0)
+        return DatasetStats(
+            x_min=-self._x_min.value(),
+            x_max=self._x_max.value(),
+            z_min=-self._z_min.value(),
+            z_max=self._z_max.value(),
+            function_min=function_min,
+            function_max=function_max,
+            koef=scale_coefficient(max_value, self.base_target_height),
+        )
+
+
+def parse_sample(line):
+    """
+    Разбирает строку отсчёта "x v1 v2 ..." (значения через пробелы, запятые или точки с запятой).
+
+    :return: (x, [v1, v2, ...]) или None для пустой строки
+    :raises ValueError: если строку нельзя разобрать как числа
+    """
+    fields = [field for field in SAMPLE_SEPARATOR.split(line.strip()) if field]
+    if not fields:
+        return None
+    numbers = [float(field) for field in fields]
+    return numbers[0], numbers[1:]
+
+
+class StreamSource(abc.ABC):
+    """
+    Источник потоковых отсчётов: читает строки в фоновом потоке и складывает их в очередь.
+
+    Потребитель (GUI) забирает накопившееся методом drain() с нужной ему частотой кадров,
+    поэтому скорость поступления данных не влияет на частоту перерисовки.
+    Наследники реализуют read_lines() - генератор строк.
+    """
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._stop = threading.Event()
+        self.num_functions = None  # Определяется по первому отсчёту
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    @abc.abstractmethod
+    def read_lines(self):
+        """Генератор строк отсчётов; выполняется в фоновом потоке."""
+
+    def _run(self):
+        try:
+            for line in self.read_lines():
+                if self.stopped:
+                    break
+                try:
+                    sample = parse_sample(line)
+                except ValueError:
+                    logging.warning("Пропущена строка потока: %r", line)
+                    continue
+                if sample is None:
+                    continue
+                if self.num_functions is None:
+                    self.num_functions = len(sample[1])
+                if len(sample[1]) != self.num_functions:
+                    logging.warning("Пропущен отсчёт с %d значениями вместо %d", len(sample[1]), self.num_functions)
+                    continue
+                self._queue.put(sample)
+        except Exception:
+            logging.exception("Источник потока %s остановлен из-за ошибки", type(self).__name__)
+
+    def drain(self, max_samples=None):
+        """
+        Забирает накопившиеся отсчёты.
+
+        :return: (x, values) - массив длины M и матрица M x num_functions, или None, если новых отсчётов нет
+        """
+        samples = []
+        while max_samples is None or len(samples) < max_samples:
+            try:
+                samples.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not samples:
+            return None
+        x_values = np.array([x for x, _ in samples], dtype=np.float64)
+        values = np.array([row for _, row in samples], dtype=np.float64).reshape(len(samples), -1)
+        return x_values, values
+
+
+class PipeSource(StreamSource):
+    """
+    Читает отсчёты из открытого файлового объекта (например, sys.stdin) или из именованного канала.
+
+    Канал, заданный путём, открывается в фоновом потоке: открытие ждёт подключения писателя.
+    Когда писатель отключается, канал открывается заново и ждёт следующего - до остановки источника.
+    """
+
+    def __init__(self, stream):
+        """stream - файловый объект или путь к именованному каналу"""
+        super().__init__()
+        self.stream = stream
+
+    def stop(self):
+        super().stop()
+        if isinstance(self.stream, str):
+            # Открытие канала на запись будит поток, который ждёт писателя в open()
+            try:
+                os.close(os.open(self.stream, os.O_WRONLY | os.O_NONBLOCK))
+            except OSError:
+                pass
+
+    def read_lines(self):
+        if not isinstance(self.stream, str):
+            yield from self.stream
+            return
+        while not self.stopped:
+            with open(self.stream, "r") as lines:
+                for line in lines:
+                    yield line
+
+
+class FileTailSource(StreamSource):
+    """Следит за дописываемым файлом, как tail -f; from_start=True читает и уже записанные строки."""
+
+    def __init__(self, path, from_start=False, poll_interval=0.05):
+        super().__init__()
+        self.path = path
+        self.from_start = from_start
+        self.poll_interval = poll_interval
+
+    def read_lines(self):
+        with open(self.path, "r") as f:
+            if not self.from_start:
+                f.seek(0, os.SEEK_END)
+            pending = ""
+            while not self.stopped:
+                chunk = f.readline()
+                if not chunk:
+                    time.sleep(self.poll_interval)
+                    continue
+                pending += chunk
+                if pending.endswith("\n"):
+                    yield pending
+                    pending = ""
+
+
+class SocketSource(StreamSource):
+    """
+    Принимает отсчёты через локальный сокет: TCP (host, port) или Unix-сокет (путь).
+
+    Подключений может быть несколько по очереди; каждое передаёт строки отсчётов.
+    """
+
+    def __init__(self, address):
+        super().__init__()
+        self.address = address
+        if isinstance(address, str):
+            self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            if os.path.exists(address):
+                os.unlink(address)
+        else:
+            self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(address)
+        self._server.listen(1)
+        self._server.settimeout(0.5)
+
+    def stop(self):
+        super().stop()
+        self._server.close()
+
+    def read_lines(self):
+        while not self.stopped:
+            try:
+                connection, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            with connection, connection.makefile("r") as lines:
+                for line in lines:
+                    yield line
+
+
+def open_stream_source(spec):
+    """
+    Создаёт и запускает источник по строке описания:
+    "-" - стандартный ввод, "tail:путь" - дописываемый файл, "tcp:хост:порт" - TCP-сокет,
+    "unix:путь" - Unix-сокет, "pipe:путь" - именованный канал.
+    """
+    if spec == "-":
+        return PipeSource(sys.stdin).start()
+    kind, _, target = spec.partition(":")
+    if kind == "tail":
+        return FileTailSource(target).start()
+    if kind == "tcp":
+        host, _, port = target.rpartition(":")
+        return SocketSource((host or "127.0.0.1", int(port))).start()
+    if kind == "unix":
+        return SocketSource(target).start()
+    if kind == "pipe":
+        return PipeSource(target).start()
+    raise ValueError(f"Неизвестный источник потока: {spec}")
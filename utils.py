@@ -1,19 +1,34 @@
 import json
+import os
+import struct
+
+import numpy as np
+
+from stats import compute_stats, function_stats
+
+# Бинарный колоночный формат: сигнатура, длина JSON-заголовка, заголовок и колонки float64
+BINARY_MAGIC = b"PGVDATA1"
+BINARY_EXTENSIONS = (".bin",)
+# Колонки выравниваются по этой границе, чтобы numpy.memmap отдавал выровненные массивы
+BINARY_ALIGNMENT = 64
 
 
 def get_x_range(x_values):
     """Возвращает минимальное и максимальное значение для оси X."""
-    return min(x_values), max(x_values)
+    x_values = np.asarray(x_values, dtype=np.float64)
+    return float(x_values.min()), float(x_values.max())
 
 
 def get_function_range(functions):
-    # Получаем количество точек (длина массива значений одной из функций)
-    num_points = len(next(iter(functions.values())))
-    # Вычисляем сумму значений функций для каждого x
-    sums = [sum(functions[func][i] for func in functions) for i in range(num_points)]
-    # Возвращаем минимальное и максимальное значения среди сумм
-    #TODO: добавить ноль
-    return min(sums), max(sums)
+    """
+    Возвращает нижнюю и верхнюю границу столбцов с накоплением.
+
+    Положительные и отрицательные значения накапливаются раздельно, поэтому границы -
+    это наименьшая сумма отрицательных и наибольшая сумма положительных частей; ноль
+    всегда входит в диапазон.
+    """
+    z_min, z_max, _, _ = function_stats(list(functions.values()))
+    return z_min, z_max
 
 
 def calculate_koef(data, base_target_height=3):
@@ -24,31 +39,89 @@ def calculate_koef(data, base_target_height=3):
     :param base_target_height: базовая целевая высота для масштабирования (по умолчанию 3)
     :return: коэффициент koef
     """
-    # Получаем все значения функций
-    functions = data["functions"]
-    all_values = []
-    for func_name in functions:
-        all_values.extend(functions[func_name])
+    return compute_stats(data, base_target_height).koef
 
-    # Находим максимальное абсолютное значение
-    max_value = max(abs(min(all_values)), abs(max(all_values)))
+def is_binary_file(filename):
+    """Определяет формат файла данных по расширению."""
+    return os.path.splitext(filename)[1].lower() in BINARY_EXTENSIONS
 
-    if max_value == 0:  # Избегаем деления на ноль
-        return 1.0
-
-    # Если максимальное значение большое (>10), нормализуем его к базовому диапазону
-    if max_value > 10:
-        # Приводим максимальное значение к диапазону около 1 и умножаем на базовую высоту
-        normalization_factor = 1 / (max_value / 10)  # Примерно масштабируем к 10
-        koef = base_target_height * normalization_factor
-    else:
-        # Для небольших значений (около 1) используем base_target_height напрямую
-        koef = base_target_height
-
-    return koef
 
 # Функция для генерации баров с накоплением
 def load_data(filename):
+    """
+    Загружает данные из JSON или из бинарного колоночного файла (.bin).
+
+    Бинарный файл открывается через numpy.memmap без копирования: x и значения функций
+    возвращаются как массивы float64, отображённые на файл.
+    """
+    if is_binary_file(filename):
+        return load_binary_data(filename)
     with open(filename, 'r') as file:
         return json.load(file)
 
+
+def save_data(data, filename):
+    """Сохраняет данные в JSON или в бинарный колоночный файл (.bin) в зависимости от расширения."""
+    if is_binary_file(filename):
+        save_binary_data(data, filename)
+        return
+    with open(filename, "w") as f:
+        json.dump({
+            "x": np.asarray(data["x"], dtype=np.float64).tolist(),
+            "functions": {name: np.asarray(values, dtype=np.float64).tolist()
+                          for name, values in data["functions"].items()},
+        }, f, indent=4)
+
+
+def save_binary_data(data, filename):
+    """
+    Записывает данные в бинарный колоночный формат.
+
+    Структура файла: BINARY_MAGIC, длина заголовка (uint32, little-endian), JSON-заголовок
+    с количеством точек и именами функций, затем выровненные колонки float64:
+    сначала x, потом по одной колонке на функцию в порядке заголовка.
+    """
+    x_values = np.asarray(data["x"], dtype="<f8")
+    function_names = list(data["functions"].keys())
+    header = json.dumps({"num_points": len(x_values), "functions": function_names}).encode("utf-8")
+    prefix_size = len(BINARY_MAGIC) + 4 + len(header)
+    padding = -prefix_size % BINARY_ALIGNMENT
+    with open(filename, "wb") as f:
+        f.write(BINARY_MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(b"\0" * padding)
+        f.write(x_values.tobytes())
+        for func_name in function_names:
+            values = np.asarray(data["functions"][func_name], dtype="<f8")
+            if len(values) != len(x_values):
+                raise ValueError(f"Функция '{func_name}' содержит {len(values)} значений вместо {len(x_values)}")
+            f.write(values.tobytes())
+
+
+def load_binary_data(filename):
+    """Открывает бинарный колоночный файл через numpy.memmap; данные не копируются в память."""
+    with open(filename, "rb") as f:
+        if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise ValueError(f"Файл {filename} не является бинарным файлом данных")
+        (header_size,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_size).decode("utf-8"))
+    prefix_size = len(BINARY_MAGIC) + 4 + header_size
+    offset = prefix_size + (-prefix_size % BINARY_ALIGNMENT)
+    num_points = header["num_points"]
+    function_names = header["functions"]
+    if num_points == 0:
+        columns = np.empty((1 + len(function_names), 0), dtype="<f8")
+    else:
+        columns = np.memmap(filename, dtype="<f8", mode="r", offset=offset,
+                            shape=(1 + len(function_names), num_points))
+    return {
+        "x": columns[0],
+        "functions": {name: columns[i + 1] for i, name in enumerate(function_names)},
+    }
+
+
+def convert_data(source, destination):
+    """Конвертирует файл данных между JSON и бинарным форматом (формат определяется по расширениям)."""
+    save_data(load_data(source), destination)
+